@@ -0,0 +1,97 @@
+from concurrent.futures import Future
+import threading
+
+
+
+class FutureStore:
+    """
+    Store loaded by a background thread, usable right away: touching it (attributes, iteration, len...) waits for
+    the end of the load, and only for it. The warm-up tasks (warm_up(store), to build the indexes) run after the load,
+    in the same thread, while the caller uses the store: they must only read it through build_index.
+    """
+
+    def __init__(self, load, warm_ups=(), waiting_message=None):
+        self._future = Future()
+        self._warm_ups = list(warm_ups)
+        self._waiting_message = waiting_message
+        # daemon: quitting doesn't wait for a load nobody needs anymore
+        threading.Thread(target=self._run, args=(load,), name="pixels-loader", daemon=True).start()
+
+
+    def _run(self, load):
+        try:
+            store = load()
+        except BaseException as error:
+            self._future.set_exception(error)
+            return
+        self._future.set_result(store)
+        for warm_up in self._warm_ups:
+            try:
+                warm_up(store)
+            except Exception:
+                pass  # the index will be built when needed
+
+
+    def ready(self) -> bool:
+        return self._future.done()
+
+
+    def result(self):
+        # The loaded store (raises the error of the load, if any)
+        if not self._future.done() and self._waiting_message:
+            print(self._waiting_message)
+        return self._future.result()
+
+
+    def __getattr__(self, name):
+        # only called for the attributes of the store
+        return getattr(self.result(), name)
+
+    def __len__(self):
+        return len(self.result())
+
+    def __iter__(self):
+        return iter(self.result())
+
+    def __contains__(self, date_string):
+        return date_string in self.result()
+
+    def __getitem__(self, item):
+        return self.result()[item]
+
+
+
+class _CatchUp:
+    # listener recording the pixels changed while an index is built, then forwarding them to it
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = []  # None once the index is published (or given up)
+        self.forward = None
+
+    def __call__(self, pixel):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append(pixel)
+            elif self.forward is not None:
+                self.forward(pixel)
+
+
+def build_index(store, name: str, build):
+    """
+    Builds store.indexes[name] = build(pixels) from a copy of the pixels, in a thread other than the one using the
+    store, which never waits for it. The pixels changed meanwhile are replayed before the index is published, then
+    each change is forwarded to store.indexes[name].update. Gives up if the other thread built the index first.
+    """
+    if store.indexes.get(name) is not None:
+        return
+    catch_up = _CatchUp()
+    store.subscribe(catch_up)  # before the copy: a pixel changed in between is in both, and updated twice
+    index = build(store.copy())  # one C call: no pixel added while copying
+    with catch_up.lock:
+        if store.indexes.get(name) is None:
+            for pixel in catch_up.pending:
+                index.update(pixel)
+            if store.indexes.setdefault(name, index) is index:
+                catch_up.forward = lambda pixel: store.indexes[name].update(pixel)
+        catch_up.pending = None
@@ -0,0 +1,91 @@
+import json
+import re
+
+
+
+CHUNK_SIZE = 1 << 16
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+
+class _Buffer:
+    # Sliding window over a text file, refilled chunk by chunk
+
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def more(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # drop what has already been consumed
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        # next non-whitespace character ("" at the end of the file)
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.more():
+                return ""
+
+    def error(self, message):
+        return ValueError(f"Invalid backup file: {message} (near {self.text[self.pos:self.pos+30]!r})")
+
+
+
+def _iter_elements(file, chunk_size, read_element):
+    buffer = _Buffer(file, chunk_size)
+    if buffer.peek() != "[":
+        raise buffer.error("expected a list of pixels")
+    buffer.pos += 1
+
+    if buffer.peek() == "]":
+        return
+    while True:
+        yield read_element(buffer)
+        char = buffer.peek()
+        if char == ",":
+            buffer.pos += 1
+        elif char == "]":
+            return
+        else:
+            raise buffer.error("expected ',' or ']'")
+
+
+def _decode_span(buffer):
+    # Decodes the next value, returns it with its start and end positions in buffer.text
+    while True:
+        buffer.peek()
+        start = buffer.pos
+        try:
+            element, end = _DECODER.raw_decode(buffer.text, start)
+            # a value ending with the buffer may have been cut (numbers), read more to be sure
+            if end < len(buffer.text) or not buffer.more():
+                buffer.pos = end
+                return element, start, end
+        except json.JSONDecodeError:
+            if not buffer.more():
+                raise
+
+
+def _decode_element(buffer):
+    return _decode_span(buffer)[0]
+
+
+
+def iter_backup(file, chunk_size=CHUNK_SIZE):
+    # Yields the elements of the top-level list of a backup one at a time, without loading the whole file
+    return _iter_elements(file, chunk_size, _decode_element)
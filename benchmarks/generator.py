@@ -0,0 +1,97 @@
+"""
+Deterministic generator of Pixels app backups: the same arguments always give the same file.
+Run from the repository root: python -m benchmarks.generator 10000 -o PIXELS-BACKUP-bench.json
+"""
+import argparse
+import json
+import random
+from datetime import date
+
+
+
+LAST_DAY = date(2024, 12, 31)
+
+# a few real words (accents included), the rest of the vocabulary is made up
+COMMON_WORDS = ["work", "friends", "family", "movie", "running", "coffee", "rain", "beach", "code", "pizza",
+                "école", "café", "soirée", "tired", "(happy)", "\"great\"", "week-end", "a", "the", "with"]
+EMOTIONS = ["Happy", "Sad", "Tired", "Calm", "Stressed", "Excited", "Bored", "Anxious", "Grateful", "Angry"]
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "zo", "ré", "ché", "tu"]
+
+
+
+def make_vocabulary(size: int, generator: random.Random) -> list:
+    words = COMMON_WORDS[:size]
+    while len(words) < size:
+        words.append("".join(generator.choice(SYLLABLES) for _ in range(generator.randint(2, 4))))
+    return words
+
+
+def generate_pixels(number_of_pixels: int, seed=0, subpixel_rate=0.2, vocabulary_size=2000,
+                    tag_categories=4, tags_per_category=12, missed_days_rate=0.03, max_words=40):
+    """
+    Yields number_of_pixels backup entries, one per day, ending around LAST_DAY (later if they don't fit).
+    subpixel_rate: share of the days with 2 or 3 scores, missed_days_rate: share of the days without a pixel.
+    """
+    generator = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size, generator)
+    categories = ["Emotions"] + [f"Category {i}" for i in range(1, tag_categories)]
+    tags = {
+        category: (EMOTIONS if category == "Emotions" else []) + [f"{category} tag {j}" for j in range(tags_per_category)]
+        for category in categories
+    }
+    # a slowly moving mood, so that averages and trends mean something
+    mood = 3.0
+
+    day = max(0, LAST_DAY.toordinal() - int(number_of_pixels * (1 + missed_days_rate)) - 1)
+    for _ in range(number_of_pixels):
+        day += 1
+        while generator.random() < missed_days_rate:
+            day += 1
+        mood = min(5.0, max(1.0, mood + generator.gauss(0, 0.4)))
+        number_of_scores = generator.choice([2, 3]) if generator.random() < subpixel_rate else 1
+        scores = [min(5, max(1, round(mood + generator.gauss(0, 0.7)))) for _ in range(number_of_scores)]
+        # words are picked with a long tail, like real notes
+        notes = " ".join(vocabulary[min(int(generator.paretovariate(0.7)) - 1, vocabulary_size - 1)]
+                         for _ in range(generator.randint(0, max_words)))
+        pixel_tags = []
+        for category in categories:
+            entries = generator.sample(tags[category], generator.randint(0, 2))
+            if entries:
+                pixel_tags.append({"type": category, "entries": entries})
+        current_day = date.fromordinal(day)
+        yield {
+            "date": f"{current_day.year}-{current_day.month}-{current_day.day}",
+            "type": "Mood",
+            "scores": scores,
+            "notes": notes,
+            "tags": pixel_tags,
+        }
+
+
+def write_backup(path: str, number_of_pixels: int, **options):
+    # Written pixel by pixel, in the same format as the Pixels app backups
+    with open(path, "w", encoding='utf-8') as file:
+        file.write("[")
+        for i, pixel in enumerate(generate_pixels(number_of_pixels, **options)):
+            file.write(",\n" if i else "\n")
+            file.write(json.dumps(pixel, ensure_ascii=False))
+        file.write("\n]")
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Pixels backup.")
+    parser.add_argument("pixels", type=int, nargs="?", default=1000, help="number of pixels")
+    parser.add_argument("-o", "--output", default="PIXELS-BACKUP-bench.json", help="path of the backup to write")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--years", type=int, help="number of years instead of a number of pixels")
+    parser.add_argument("--subpixel-rate", type=float, default=0.2)
+    parser.add_argument("--vocabulary", type=int, default=2000, help="number of distinct words in the notes")
+    parser.add_argument("--tag-categories", type=int, default=4)
+    parser.add_argument("--tags-per-category", type=int, default=12)
+    args = parser.parse_args()
+
+    number_of_pixels = args.years * 365 if args.years else args.pixels
+    write_backup(args.output, number_of_pixels, seed=args.seed, subpixel_rate=args.subpixel_rate,
+                 vocabulary_size=args.vocabulary, tag_categories=args.tag_categories,
+                 tags_per_category=args.tags_per_category)
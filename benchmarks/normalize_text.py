@@ -0,0 +1,68 @@
+"""
+Time of the text normalization used by the searches and the statistics, before and after the translation table.
+Run from the repository root: python -m benchmarks.normalize_text [number of pixels]
+"""
+import json
+import sys
+import time
+
+from benchmarks.generator import generate_pixels
+from normalize import format_tags, format_text
+
+
+
+def legacy_format_text(text):
+    # format_text before normalize.py: one str.replace per special character
+    accents = {
+        'a': ['à', 'ã', 'á', 'â'],
+        'e': ['é', 'è', 'ê', 'ë'],
+        'i': ['î', 'ï'],
+        'u': ['ù', 'ü', 'û'],
+        'o': ['ô', 'ö'],
+        '': ['(', ')', '"', '\'']
+    }
+    text = str(text).strip().lower()
+    for (char, special_chars) in accents.items():
+        for special in special_chars:
+            text = text.replace(special, char)
+    return text
+
+
+
+def texts_of(raw_pixels: list) -> tuple:
+    # the notes and the tag lists, normalized again at every search, a few of them with accents and quotes
+    notes = [raw_pixel["notes"] + (" Été (\"très\" bien), où ça ?" if i % 5 == 0 else "") for i, raw_pixel in enumerate(raw_pixels)]
+    tags = [tuple((category["type"], entry) for category in raw_pixel["tags"] for entry in category["entries"])
+            for raw_pixel in raw_pixels]
+    return notes, tags
+
+
+def seconds(function, texts: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            function(text)
+    return time.perf_counter() - start
+
+
+
+if __name__ == "__main__":
+    number_of_pixels = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = 5  # like five searches in a row
+    notes, tags = texts_of(list(generate_pixels(number_of_pixels)))
+    for text in notes:
+        assert format_text(text) == legacy_format_text(text), text
+    for pixel_tags in tags:
+        assert format_text(list(pixel_tags)) == legacy_format_text(list(pixel_tags)) == format_tags(pixel_tags), pixel_tags
+
+    format_tags.cache_clear()
+    results = {
+        "pixels": number_of_pixels,
+        "searches": repeat,
+        "notes_legacy_s": seconds(legacy_format_text, notes, repeat),
+        "notes_table_s": seconds(format_text, notes, repeat),
+        "tags_legacy_s": seconds(lambda pixel_tags: legacy_format_text(list(pixel_tags)), tags, repeat),
+        "tags_table_s": seconds(lambda pixel_tags: format_text(list(pixel_tags)), tags, repeat),
+        "tags_cached_s": seconds(format_tags, tags, repeat),
+    }
+    print(json.dumps({key: round(value, 4) if isinstance(value, float) else value for key, value in results.items()}, indent=4))
@@ -0,0 +1,47 @@
+"""
+Memory used by each pixel, before and after the compact Pixel class.
+Run from the repository root: python -m benchmarks.pixel_memory [number of pixels]
+"""
+import json
+import sys
+import tracemalloc
+
+from benchmarks.generator import generate_pixels
+from pixel import Pixel
+
+
+
+class LegacyPixel:
+    # The Pixel class before __slots__: a __dict__, the date as a string, the tags twice
+
+    def __init__(self, pixel: dict):
+        self.date = pixel["date"]
+        self.pixel_type = pixel["type"]
+        self.scores = pixel["scores"]
+        self.notes = pixel["notes"]
+        self.tags = [(category["type"], entry) for category in pixel["tags"] for entry in category["entries"]]
+        self.raw_tags = pixel["tags"]
+
+
+
+def bytes_per_pixel(pixel_class, backup: str) -> float:
+    # memory kept by the pixels once the backup is loaded (the JSON text excluded)
+    tracemalloc.start()
+    pixels = [pixel_class(pixel=raw_pixel) if pixel_class is Pixel else pixel_class(raw_pixel) for raw_pixel in json.loads(backup)]
+    used_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used_memory / len(pixels)
+
+
+
+if __name__ == "__main__":
+    number_of_pixels = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    backup = json.dumps(list(generate_pixels(number_of_pixels)))
+    legacy = bytes_per_pixel(LegacyPixel, backup)
+    compact = bytes_per_pixel(Pixel, backup)
+    print(json.dumps({
+        "pixels": number_of_pixels,
+        "legacy_bytes_per_pixel": round(legacy),
+        "compact_bytes_per_pixel": round(compact),
+        "saved": f"{100 * (1 - compact / legacy):.1f}%",
+    }, indent=4))
@@ -0,0 +1,129 @@
+"""
+Times the entry points of pixel.py on generated backups of growing size, and reports time and peak memory as JSON.
+Run from the repository root: python -m benchmarks.run --sizes 1000,10000 --output bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import pixel
+import trends
+from benchmarks.generator import write_backup
+
+
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+TAGS_TO_ADD = [("Activities", "coffee"), ("Activities", "running"), ("People", "friends"), ("People", "family"),
+               ("Food", "pizza"), ("Places", "beach"), ("Places", "ecole"), ("Weather", "rain")]
+
+
+def operations(pixel_file):
+    # (name, setup, function): setup() returns the arguments of function, it isn't timed
+    def loaded():
+        return pixel.load_pixels(pixel_file)[1]
+
+    def without_cache():
+        if os.path.exists(pixel.cache.cache_path(pixel_file)):
+            os.remove(pixel.cache.cache_path(pixel_file))
+        return ()
+
+    def with_cache():
+        pixel.load_pixels(pixel_file)  # writes the cache
+        return ()
+
+    def with_search_index():
+        pixels = loaded()
+        pixel.get_search_index(pixels)
+        return pixels
+
+    return [
+        ("load_pixels", without_cache, lambda: pixel.load_pixels(pixel_file)),
+        ("load_pixels (cached)", with_cache, lambda: pixel.load_pixels(pixel_file)),
+        ("display_statistics", loaded, lambda pixels: pixel.display_statistics(pixels, 10)),
+        ("display_pixels_year", loaded, lambda pixels: pixel.display_pixels_year(pixels, 0)),
+        ("search_pixel_by_date", loaded, lambda pixels: pixel.search_pixel_by_date(pixels, "2024-12-1")),
+        ("search_pixel_by_mood", loaded, lambda pixels: pixel.search_pixel_by_mood(pixels, "5", 10)),
+        ("search_pixel_by_notes (first search)", loaded, lambda pixels: pixel.search_pixel_by_notes(pixels, "coffee", 10)),
+        ("search_pixel_by_notes", with_search_index, lambda pixels: pixel.search_pixel_by_notes(pixels, "coffee", 10)),
+        ("search_pixel_by_tag", with_search_index, lambda pixels: pixel.search_pixel_by_tag(pixels, "happy", 10)),
+        ("add_tag_to_pixels", loaded, lambda pixels: pixel.auto_tag_pixels(pixels, pixel_file, TAGS_TO_ADD, dry_run=True)),
+        ("write_to_json", loaded, lambda pixels: pixel.write_to_json(pixels, pixel_file + ".out.json")),
+    ]
+
+
+def measure(setup, function, repeat):
+    # best time of repeat runs, then the peak memory of one more run (tracemalloc slows the run down)
+    best_time = None
+    for _ in range(repeat):
+        arguments = setup()
+        arguments = arguments if isinstance(arguments, tuple) else (arguments,)
+        start_time = time.perf_counter()
+        function(*arguments)
+        elapsed_time = time.perf_counter() - start_time
+        best_time = elapsed_time if best_time is None else min(best_time, elapsed_time)
+
+    arguments = setup()
+    arguments = arguments if isinstance(arguments, tuple) else (arguments,)
+    tracemalloc.start()
+    function(*arguments)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best_time, peak_memory
+
+
+def run(sizes, repeat=3, seed=0, only=None):
+    results = []
+    for size in sizes:
+        directory = tempfile.mkdtemp(prefix="pixels-bench-")
+        previous_directory = os.getcwd()
+        try:
+            os.chdir(directory)  # statistics/ and excluded_words.txt are written there
+            pixel_file = os.path.join(directory, "PIXELS-BACKUP-bench.json")
+            write_backup(pixel_file, size, seed=seed)
+            for name, setup, function in operations(pixel_file):
+                if only and not any(word in name for word in only):
+                    continue
+                with contextlib.redirect_stdout(io.StringIO()):
+                    seconds, peak_memory = measure(setup, function, repeat)
+                result = {"pixels": size, "operation": name, "seconds": round(seconds, 6), "peak_memory_bytes": peak_memory}
+                results.append(result)
+                print(f"{size:>9} {name:<40} {seconds:>10.4f}s {peak_memory / 2**20:>10.1f} MiB", flush=True)
+        finally:
+            os.chdir(previous_directory)
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pixel.py entry points.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma separated numbers of pixels")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measure, the best time is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", help="comma separated parts of operation names to run")
+    parser.add_argument("--output", help="JSON file for the results (printed otherwise)")
+    args = parser.parse_args()
+
+    results = run([int(size) for size in args.sizes.split(",")], args.repeat, args.seed,
+                  args.only.split(",") if args.only else None)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": trends.np is not None,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
@@ -0,0 +1,64 @@
+"""
+Throughput and size of the backup formats written by write_to_json, compared to the json.dump it replaces.
+Every format is read back and compared to the pixels written.
+Run from the repository root: python -m benchmarks.serializers [number of pixels]
+"""
+import io
+import json
+import sys
+import time
+
+from backup_reader import iter_backup
+from benchmarks.generator import generate_pixels
+from pixel import Pixel, PixelEncoder
+from serializers import SERIALIZERS, dump_backup, orjson
+
+
+
+class LegacyEncoder(json.JSONEncoder):
+    # PixelEncoder before the serializers: a dict per pixel, built by json.JSONEncoder.default
+
+    def default(self, obj):
+        if isinstance(obj, Pixel):
+            return {
+                "date": obj.date,
+                "type": obj.pixel_type,
+                "scores": list(map(int, obj.scores)),
+                "notes": obj.notes,
+                "tags": PixelEncoder.encode_tags(obj.tags),
+            }
+        return super().default(obj)
+
+
+def legacy_dump(file, pixels):
+    json.dump(list(pixels), file, cls=LegacyEncoder, ensure_ascii=False, indent=4)
+
+
+def timed_dump(dump, pixels) -> tuple:
+    file = io.StringIO()
+    start_time = time.perf_counter()
+    dump(file, pixels)
+    return time.perf_counter() - start_time, file.getvalue()
+
+
+
+if __name__ == "__main__":
+    number_of_pixels = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    pixels = [Pixel(pixel=raw_pixel) for raw_pixel in generate_pixels(number_of_pixels)]
+    expected = [pixel.backup_dict() for pixel in pixels]
+
+    legacy_time, legacy_text = timed_dump(legacy_dump, pixels)
+    results = {"pixels": number_of_pixels, "orjson_installed": orjson is not None,
+               "legacy": {"seconds": round(legacy_time, 4), "bytes": len(legacy_text.encode("utf-8"))}}
+    for backup_format in SERIALIZERS:
+        seconds, text = timed_dump(lambda file, pixels: dump_backup(file, (pixel.backup_dict() for pixel in pixels), backup_format), pixels)
+        assert list(iter_backup(io.StringIO(text))) == expected, backup_format
+        if backup_format == "pretty":
+            assert text == legacy_text, "the pretty format must not change the backups"
+        results[backup_format] = {
+            "seconds": round(seconds, 4),
+            "bytes": len(text.encode("utf-8")),
+            "pixels_per_second": round(number_of_pixels / max(seconds, 1e-9)),
+            "speedup": round(legacy_time / max(seconds, 1e-9), 1),
+        }
+    print(json.dumps(results, indent=4))
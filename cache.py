@@ -0,0 +1,66 @@
+import hashlib
+import mmap
+import os
+import pickle
+
+
+
+# bump when the content of the cache changes
+CACHE_VERSION = 5
+
+
+def cache_path(pixel_file: str) -> str:
+    # not matched by the "*.json" pattern of find_pixel_file
+    return pixel_file + ".cache"
+
+
+def content_hash(pixel_file: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(pixel_file, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_key(pixel_file: str, with_hash=True) -> dict:
+    stat = os.stat(pixel_file)
+    return {
+        "version": CACHE_VERSION,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": content_hash(pixel_file) if with_hash else None,
+    }
+
+
+def load(pixel_file: str):
+    # The cached data of the backup, or None if there is no cache or if the backup changed since
+    path = cache_path(pixel_file)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    try:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            key = pickle.load(data)
+            current_key = _file_key(pixel_file, with_hash=False)
+            if key["version"] != current_key["version"] or key["size"] != current_key["size"]:
+                return None
+            # same size but touched since: only trust the cache if the content is the same
+            if key["mtime"] != current_key["mtime"] and key["hash"] != content_hash(pixel_file):
+                return None
+            return pickle.load(data)
+    except (OSError, ValueError, EOFError, KeyError, pickle.UnpicklingError):
+        return None  # unreadable cache, it will be rebuilt
+
+
+def save(pixel_file: str, data):
+    path = cache_path(pixel_file)
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            pickle.dump(_file_key(pixel_file), file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except OSError:
+        pass  # the cache is only a speed-up
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
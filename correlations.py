@@ -0,0 +1,102 @@
+from array import array
+from collections import Counter
+from itertools import chain
+
+from normalize import format_text
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the same results are computed with plain arrays
+    np = None
+
+
+
+class TermMatrix:
+    """
+    Pixels × terms sparse matrix (compressed rows): the terms of the pixel i are the columns
+    columns[row_starts[i]:row_starts[i + 1]], the words of its notes then its tags, each at most once.
+    Built from the statistics, which already keep the notes tokenized and the tags of each pixel.
+    """
+
+    def __init__(self, terms: list, moods: array, row_starts: array, columns: array):
+        self.terms = terms  # column -> term (word, or displayed tag name)
+        self.moods = moods  # row -> mood of the pixel (mean of its scores)
+        self.row_starts = row_starts
+        self.columns = columns
+
+
+    @classmethod
+    def from_statistics(cls, statistics, tag_names: dict):
+        # the words are the token ids of the notes, the tags are grouped by displayed name (see StatsAccumulator.tag_names)
+        terms = list(statistics.notes.tokens)
+        excluded_words = statistics.notes.excluded_words
+        tag_columns = {}  # (category, name) -> column (None for the excluded tags)
+        name_columns = {}  # displayed name -> column
+        for tag, name in tag_names.items():
+            if format_text(tag[1]) in excluded_words:
+                tag_columns[tag] = None
+                continue
+            column = name_columns.get(name)
+            if column is None:
+                column = name_columns[name] = len(terms)
+                terms.append(name)
+            tag_columns[tag] = column
+
+        moods = array('d')
+        row_starts = array('l', [0])
+        columns = array('I')
+        pixel_tokens = statistics.notes.pixel_tokens
+        for ordinal in statistics.ordinals:
+            scores, tags = statistics.pixels[ordinal]
+            moods.append(sum(scores) / len(scores))
+            columns.extend(pixel_tokens[ordinal])
+            if tags:
+                columns.extend({column: None for column in map(tag_columns.get, tags) if column is not None})
+            row_starts.append(len(columns))
+        return cls(terms, moods, row_starts, columns)
+
+
+    def __len__(self):
+        return len(self.moods)
+
+
+    def column_sums(self) -> tuple:
+        # (number of pixels, sum of the moods of these pixels) of each term
+        number_of_terms = len(self.terms)
+        if np is not None:
+            columns = np.asarray(self.columns)
+            row_lengths = np.diff(np.asarray(self.row_starts))
+            counts = np.bincount(columns, minlength=number_of_terms)
+            sums = np.bincount(columns, weights=np.repeat(np.asarray(self.moods), row_lengths), minlength=number_of_terms)
+            return counts.tolist(), sums.tolist()
+        # few distinct moods: the terms of the pixels of each mood are counted together
+        rows_by_mood = {}
+        row_starts, columns = self.row_starts, self.columns
+        for row, mood in enumerate(self.moods):
+            rows_by_mood.setdefault(mood, []).append(columns[row_starts[row]:row_starts[row + 1]])
+        counts = [0] * number_of_terms
+        sums = [0.0] * number_of_terms
+        for mood, rows in rows_by_mood.items():
+            for column, count in Counter(chain.from_iterable(rows)).items():
+                counts[column] += count
+                sums[column] += mood * count
+        return counts, sums
+
+
+    def correlations(self, min_pixels: int) -> list:
+        """
+        (term, number of pixels, mean mood, lift, support) of the terms of at least min_pixels pixels, the terms of
+        the best days first. lift: mean mood of the pixels using the term / mean mood of all the pixels,
+        support: share of the pixels using the term.
+        """
+        if len(self) == 0:
+            return []
+        average_mood = sum(self.moods) / len(self)
+        counts, sums = self.column_sums()
+        found = []
+        for column, count in enumerate(counts):
+            if count >= max(min_pixels, 1):
+                mean_mood = sums[column] / count
+                found.append((self.terms[column], count, mean_mood, mean_mood / average_mood, count / len(self)))
+        found.sort(key=lambda term: (-term[3], -term[1]))
+        return found
@@ -0,0 +1,254 @@
+from datetime import date
+import sqlite3
+
+from backup_reader import iter_backup
+from normalize import format_text
+from notes_index import NotesIndex
+from store import date_to_ordinal
+
+
+
+BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pixels (
+    ordinal INTEGER PRIMARY KEY,  -- day
+    date TEXT NOT NULL,
+    type TEXT NOT NULL,
+    notes TEXT NOT NULL,
+    mood REAL NOT NULL  -- mean of the scores
+);
+CREATE TABLE IF NOT EXISTS scores (
+    ordinal INTEGER NOT NULL REFERENCES pixels ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    PRIMARY KEY (ordinal, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scores_score ON scores (score, ordinal);
+CREATE TABLE IF NOT EXISTS tags (
+    ordinal INTEGER NOT NULL REFERENCES pixels ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    name TEXT NOT NULL,
+    formated TEXT NOT NULL,  -- normalized "category name", for the searches
+    PRIMARY KEY (ordinal, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_name ON tags (name, category);
+CREATE TABLE IF NOT EXISTS words (
+    ordinal INTEGER NOT NULL REFERENCES pixels ON DELETE CASCADE,
+    word TEXT NOT NULL,
+    PRIMARY KEY (word, ordinal)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS words_ordinal ON words (ordinal);
+-- normalized notes, rowid = day: the trigram tokenizer serves substring searches
+CREATE VIRTUAL TABLE IF NOT EXISTS notes USING fts5 (text, tokenize = 'trigram');
+"""
+
+
+def database_path(pixel_file: str) -> str:
+    # not matched by the "*.json" pattern of find_pixel_file
+    return pixel_file + ".sqlite"
+
+
+
+class PixelDatabase:
+    """
+    Pixels stored in a SQLite database: a row per pixel, score, tag and distinct word of the notes, and a full text
+    index of the notes. Queries run on the indexes, only their results are loaded in memory.
+    Pixels go in and out in the backup format (dicts with date, type, scores, notes and tags).
+    """
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+        self.words_index = NotesIndex()  # tokenizes the notes like the statistics
+
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM pixels").fetchone()[0]
+
+
+    def _words(self, notes: str) -> list:
+        tokens = self.words_index.tokens
+        return [tokens[token_id] for token_id in self.words_index.tokenize(notes)]
+
+
+    def _insert(self, raw_pixel: dict):
+        ordinal = date_to_ordinal(raw_pixel["date"])
+        scores = [int(score) for score in raw_pixel["scores"]]
+        notes = raw_pixel.get("notes", "")
+        execute = self.connection.execute
+        execute("DELETE FROM pixels WHERE ordinal = ?", (ordinal,))
+        execute("DELETE FROM notes WHERE rowid = ?", (ordinal,))
+        execute("INSERT INTO pixels VALUES (?, ?, ?, ?, ?)",
+                (ordinal, raw_pixel["date"], raw_pixel.get("type", "Mood"), notes, sum(scores) / len(scores)))
+        self.connection.executemany("INSERT INTO scores VALUES (?, ?, ?)",
+                                    [(ordinal, position, score) for position, score in enumerate(scores)])
+        tags = [(category["type"], entry) for category in raw_pixel.get("tags", []) for entry in category["entries"]]
+        self.connection.executemany("INSERT INTO tags VALUES (?, ?, ?, ?, ?)", [
+            (ordinal, position, categoryName, entry, format_text(f"{categoryName} {entry}"))
+            for position, (categoryName, entry) in enumerate(tags)
+        ])
+        self.connection.executemany("INSERT INTO words VALUES (?, ?)", [(ordinal, word) for word in self._words(notes)])
+        execute("INSERT INTO notes (rowid, text) VALUES (?, ?)", (ordinal, format_text(notes)))
+
+
+    def import_backup(self, pixel_file: str) -> int:
+        # Replaces the content of the database by the pixels of a backup, streamed (the first pixel of a day is kept)
+        number_of_pixels = 0
+        with self.connection, open(pixel_file, "r", encoding='utf-8') as file:
+            for table in ("notes", "words", "tags", "scores", "pixels"):
+                self.connection.execute(f"DELETE FROM {table}")
+            for raw_pixel in iter_backup(file):
+                ordinal = date_to_ordinal(raw_pixel["date"])
+                if self.connection.execute("SELECT 1 FROM pixels WHERE ordinal = ?", (ordinal,)).fetchone():
+                    continue
+                self._insert(raw_pixel)
+                number_of_pixels += 1
+        return number_of_pixels
+
+
+    def add(self, raw_pixel: dict):
+        # Writes a pixel in its own transaction, overwriting the pixel of the same day
+        with self.connection:
+            self._insert(raw_pixel)
+
+
+    def _raw_pixels(self, ordinals) -> list:
+        pixels = []
+        for ordinal in ordinals:
+            row = self.connection.execute("SELECT date, type, notes FROM pixels WHERE ordinal = ?", (ordinal,)).fetchone()
+            if row is None:
+                continue
+            scores = [score for (score,) in self.connection.execute(
+                "SELECT score FROM scores WHERE ordinal = ? ORDER BY position", (ordinal,))]
+            tags = {}
+            for categoryName, entry in self.connection.execute(
+                    "SELECT category, name FROM tags WHERE ordinal = ? ORDER BY position", (ordinal,)):
+                tags.setdefault(categoryName, []).append(entry)
+            pixels.append({
+                "date": row[0],
+                "type": row[1],
+                "scores": scores,
+                "notes": row[2],
+                "tags": [{"type": categoryName, "entries": entries} for categoryName, entries in tags.items()],
+            })
+        return pixels
+
+
+    def get(self, date_string: str):
+        pixels = self._raw_pixels([date_to_ordinal(date_string)])
+        return pixels[0] if pixels else None
+
+
+    def iter_pixels(self, batch_size=BATCH_SIZE):
+        # All the pixels sorted by date, batch by batch
+        last_ordinal = -1
+        while True:
+            ordinals = [ordinal for (ordinal,) in self.connection.execute(
+                "SELECT ordinal FROM pixels WHERE ordinal > ? ORDER BY ordinal LIMIT ?", (last_ordinal, batch_size))]
+            if not ordinals:
+                return
+            yield from self._raw_pixels(ordinals)
+            last_ordinal = ordinals[-1]
+
+
+    def _search(self, condition: str, parameters: tuple, number_of_pixels: int) -> tuple:
+        # (the first number_of_pixels pixels matching, number of pixels matching, their average mood)
+        count, average_mood = self.connection.execute(
+            f"SELECT COUNT(*), AVG(mood) FROM pixels WHERE ordinal IN ({condition})", parameters).fetchone()
+        ordinals = [ordinal for (ordinal,) in self.connection.execute(
+            f"SELECT ordinal FROM pixels WHERE ordinal IN ({condition}) ORDER BY ordinal LIMIT ?", parameters + (number_of_pixels,))]
+        return self._raw_pixels(ordinals), count, average_mood
+
+
+    def search_notes(self, search_notes: str, number_of_pixels: int) -> tuple:
+        formated_notes = format_text(search_notes)
+        if len(formated_notes) >= 3:
+            # a quoted string is searched as a substring by the trigram tokenizer
+            return self._search("SELECT rowid FROM notes WHERE notes MATCH ?",
+                                ('"' + formated_notes.replace('"', '""') + '"',), number_of_pixels)
+        return self._search("SELECT rowid FROM notes WHERE instr(text, ?) > 0", (formated_notes,), number_of_pixels)
+
+
+    def search_mood(self, search_mood: int, number_of_pixels: int) -> tuple:
+        return self._search("SELECT ordinal FROM scores WHERE score = ?", (int(search_mood),), number_of_pixels)
+
+
+    def search_tag(self, search_tag: str, number_of_pixels: int) -> tuple:
+        return self._search("SELECT ordinal FROM tags WHERE instr(formated, ?) > 0", (format_text(search_tag),), number_of_pixels)
+
+
+    #  Aggregates
+
+    def first_day(self) -> date:
+        ordinal = self.connection.execute("SELECT MIN(ordinal) FROM pixels").fetchone()[0]
+        return None if ordinal is None else date.fromordinal(ordinal)
+
+
+    def total_days(self) -> int:
+        first_day, last_day = self.connection.execute("SELECT MIN(ordinal), MAX(ordinal) FROM pixels").fetchone()
+        return 0 if first_day is None else last_day - first_day + 1
+
+
+    def runs(self) -> list:
+        # lengths of the runs of consecutive days, the oldest first
+        return [length for (length,) in self.connection.execute(
+            "SELECT COUNT(*) FROM (SELECT ordinal, ordinal - ROW_NUMBER() OVER (ORDER BY ordinal) AS run FROM pixels) "
+            "GROUP BY run ORDER BY MIN(ordinal)")]
+
+
+    def mood_counts(self) -> dict:
+        return dict(self.connection.execute("SELECT score, COUNT(*) FROM scores GROUP BY score"))
+
+
+    def _last_days_condition(self, last_days):
+        # the last_days days up to the last pixel (all the days if None), like StatsAccumulator.last_days
+        if last_days is None:
+            return "", ()
+        return " WHERE ordinal > (SELECT MAX(ordinal) FROM pixels) - ?", (last_days,)
+
+
+    def count_pixels(self, last_days=None) -> int:
+        condition, parameters = self._last_days_condition(last_days)
+        return self.connection.execute(f"SELECT COUNT(*) FROM pixels{condition}", parameters).fetchone()[0]
+
+
+    def average_mood(self, last_days=None) -> float:
+        # average of the mean scores of the pixels of the last_days days up to the last pixel (all of them by default)
+        condition, parameters = self._last_days_condition(last_days)
+        return self.connection.execute(f"SELECT AVG(mood) FROM pixels{condition}", parameters).fetchone()[0]
+
+
+    def top_words(self, number_of_words: int, excluded_words=(), last_days=None) -> list:
+        # (word, number of pixels using it), among the pixels of the last_days days up to the last pixel (all of them by default)
+        excluded_words = sorted({format_text(word) for word in excluded_words if word != ""})
+        condition, parameters = self._last_days_condition(last_days)
+        if excluded_words:
+            condition += (" AND" if condition else " WHERE") + f" word NOT IN ({', '.join('?' * len(excluded_words))})"
+            parameters += tuple(excluded_words)
+        return self.connection.execute(
+            f"SELECT word, COUNT(*) AS uses FROM words{condition} GROUP BY word ORDER BY uses DESC, MAX(ordinal) DESC LIMIT ?",
+            parameters + (number_of_words,)).fetchall()
+
+
+    def top_tags(self, number_of_tags: int, last_days=None) -> list:
+        # ("name (category)", number of uses)
+        condition, parameters = self._last_days_condition(last_days)
+        return self.connection.execute(
+            # ties: the most recently used first, then the first in that pixel (position of the row of MAX(ordinal))
+            f"SELECT tag, uses FROM (SELECT name || ' (' || category || ')' AS tag, COUNT(*) AS uses, MAX(ordinal) AS last_use, "
+            f"position FROM tags{condition} GROUP BY name, category) ORDER BY uses DESC, last_use DESC, position LIMIT ?",
+            parameters + (number_of_tags,)).fetchall()
@@ -0,0 +1,66 @@
+import calendar
+from datetime import date
+
+from styles import BOLD, GREY, PIXEL_CHAR, RESET, get_color_of_mood
+
+
+
+MOODS = (1, 2, 3, 4, 5)
+EMPTY_CELL = "  "  # a pixel takes two columns
+
+
+def mood_cells(get_color=get_color_of_mood) -> dict:
+    # mood -> colored pixel, computed once from the palette
+    return {mood: f"{get_color([mood]) or ''}{PIXEL_CHAR}{RESET}" for mood in MOODS}
+
+
+MOOD_CELLS = mood_cells()
+
+
+def cell(scores) -> str:
+    # the color of a pixel is the one of its first score
+    return MOOD_CELLS.get(scores[0], PIXEL_CHAR) if len(scores) else PIXEL_CHAR
+
+
+
+def render_grid(pixels) -> str:
+    # One line per month with pixels, one cell per day of the month. pixels must be sorted by date.
+    lines = []
+    current_month = None
+    for pixel in pixels:
+        day = date.fromordinal(pixel.ordinal)
+        if (day.year, day.month) != current_month:
+            current_month = (day.year, day.month)
+            line = [EMPTY_CELL] * 31
+            lines.append(line)
+        line[day.day - 1] = cell(pixel.scores)
+    return "".join("".join(line) + "\n" for line in lines)
+
+
+def render_month(pixels, year: int, month: int) -> str:
+    """
+    Calendar of a month, one column per day of the week. pixels are the pixels of the month,
+    the days without a pixel show their number.
+    """
+    cells = {date.fromordinal(pixel.ordinal).day: cell(pixel.scores) for pixel in pixels}
+    lines = [f"{BOLD}{calendar.month_name[month]} {year}{RESET}", " ".join(name[:2] for name in calendar.day_abbr)]
+    for week in calendar.monthcalendar(year, month):
+        line = []
+        for day in week:
+            if day == 0:
+                line.append(EMPTY_CELL)
+            elif day in cells:
+                line.append(cells[day])
+            else:
+                line.append(f"{GREY}{day:>2}{RESET}")
+        lines.append(" ".join(line))
+    return "\n".join(lines) + "\n"
+
+
+def month_bounds(year: int, month: int) -> tuple:
+    # first and last day of a month, as dates
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def previous_month(year: int, month: int) -> tuple:
+    return (year, month - 1) if month > 1 else (year - 1, 12)
@@ -0,0 +1,61 @@
+import json
+import os
+
+import profiling
+
+
+
+def journal_path(pixel_file: str) -> str:
+    # not matched by the "*.json" pattern of find_pixel_file
+    return pixel_file + ".journal"
+
+
+def append_records(pixel_file: str, records: list):
+    # One JSON record per line, flushed to the disk before returning: the cost doesn't depend on the backup size
+    lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    with open(journal_path(pixel_file), "a", encoding='utf-8') as file:
+        file.write(lines)
+        file.flush()
+        os.fsync(file.fileno())
+    profiling.count("bytes written", len(lines.encode('utf-8')))
+
+
+def read_records(pixel_file: str):
+    path = journal_path(pixel_file)
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding='utf-8') as file:
+        for line in file:
+            if not line.endswith("\n"):
+                return  # last record cut by a crash, it was never acknowledged
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                return
+            yield record
+
+
+def has_records(pixel_file: str) -> bool:
+    path = journal_path(pixel_file)
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+
+def clear(pixel_file: str):
+    path = journal_path(pixel_file)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def write_atomic(path: str, write):
+    # write(file) fills a temporary file which then replaces path, so a crash never leaves a truncated file
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding='utf-8') as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+            profiling.count("bytes written", file.tell())
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,112 @@
+from itertools import groupby
+from operator import itemgetter
+import heapq
+
+from backup_reader import iter_backup
+from serializers import dump_backup
+from store import date_to_ordinal
+import journal
+
+
+
+# what to keep when several backups have a pixel for the same day
+POLICIES = ("newest", "union", "concat")
+
+
+class UnsortedBackup(ValueError):
+    # raised by the stream of a backup that isn't sorted by date: it has to be sorted in memory
+    def __init__(self, pixel_file: str):
+        super().__init__(f"'{pixel_file}' is not sorted by date")
+        self.pixel_file = pixel_file
+
+
+def _sorted_pixels(pixel_file: str, file_number: int, in_memory=False):
+    """
+    (day ordinal, file number, pixel) of a backup sorted by date, the first pixel of a day only.
+    Streamed, unless in_memory: the whole backup is then read and sorted (for the backups not sorted by date).
+    """
+    with open(pixel_file, "r", encoding='utf-8') as file:
+        if in_memory:
+            raw_pixels = {}
+            for raw_pixel in iter_backup(file):
+                raw_pixels.setdefault(date_to_ordinal(raw_pixel["date"]), raw_pixel)
+            for ordinal in sorted(raw_pixels):
+                yield ordinal, file_number, raw_pixels[ordinal]
+            return
+        last_ordinal = None
+        for raw_pixel in iter_backup(file):
+            ordinal = date_to_ordinal(raw_pixel["date"])
+            if last_ordinal is not None and ordinal <= last_ordinal:
+                if ordinal == last_ordinal:
+                    continue  # duplicate day, like when loading the backup
+                raise UnsortedBackup(pixel_file)
+            last_ordinal = ordinal
+            yield ordinal, file_number, raw_pixel
+
+
+def _union_tags(raw_pixels) -> list:
+    # tags of all the pixels, in the backup format, without duplicates
+    categories = {}
+    for raw_pixel in raw_pixels:
+        for category in raw_pixel.get("tags", []):
+            entries = categories.setdefault(category["type"], [])
+            entries.extend(entry for entry in category["entries"] if entry not in entries)
+    return [{"type": categoryName, "entries": entries} for categoryName, entries in categories.items()]
+
+
+def resolve(raw_pixels: list, policy: str) -> dict:
+    """
+    One pixel from the pixels of the same day, from the oldest backup to the newest.
+    newest: the pixel of the newest backup. union: the same, with the tags of all of them.
+    concat: the same as union, with the different notes of all of them, oldest first.
+    """
+    newest = raw_pixels[-1]
+    if len(raw_pixels) == 1 or policy == "newest":
+        return newest
+    merged = dict(newest, tags=_union_tags(raw_pixels))
+    if policy == "concat":
+        notes = []
+        for raw_pixel in raw_pixels:
+            note = raw_pixel.get("notes", "").strip()
+            if note and note not in notes:
+                notes.append(note)
+        merged["notes"] = "\n".join(notes)
+    return merged
+
+
+def iter_merged(pixel_files: list, policy="newest", unsorted_files=()):
+    """
+    Pixels of several backups (given from the oldest to the newest) merged by date. Only one pixel per backup
+    sorted by date is in memory at a time, the backups of unsorted_files are sorted in memory.
+    Raises UnsortedBackup for another backup not sorted by date. Yields (pixel, number of backups having the day).
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown merge policy '{policy}', use one of {', '.join(POLICIES)}")
+    streams = [_sorted_pixels(pixel_file, file_number, pixel_file in unsorted_files)
+               for file_number, pixel_file in enumerate(pixel_files)]
+    for _, day_pixels in groupby(heapq.merge(*streams, key=itemgetter(0, 1)), key=itemgetter(0)):
+        raw_pixels = [raw_pixel for _, _, raw_pixel in day_pixels]
+        yield resolve(raw_pixels, policy), len(raw_pixels)
+
+
+def merge_backups(pixel_files: list, output_file: str, policy="newest", backup_format="pretty") -> tuple:
+    # Writes the merged backup in one pass (see serializers for the formats). Returns (pixels written, days in conflict).
+    for pixel_file in pixel_files + [output_file]:
+        if journal.has_records(pixel_file):
+            raise ValueError(f"'{pixel_file}' has unsaved changes in its journal, save them to the backup first")
+    unsorted_files = set()
+    while True:
+        counts = [0, 0]
+
+        def merged_pixels():
+            for raw_pixel, number_of_backups in iter_merged(pixel_files, policy, unsorted_files):
+                counts[0] += 1
+                counts[1] += number_of_backups > 1
+                yield raw_pixel
+
+        try:
+            journal.write_atomic(output_file, lambda file: dump_backup(file, merged_pixels(), backup_format))
+            return tuple(counts)
+        except UnsortedBackup as error:
+            # the output is left untouched: merged again, this backup being sorted in memory
+            unsorted_files.add(error.pixel_file)
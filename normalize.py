@@ -0,0 +1,68 @@
+from functools import lru_cache
+import unicodedata
+
+
+
+# normalized tags kept by format_tags (the notes are too many, and rarely the same, to be worth caching)
+CACHE_SIZE = 1 << 16
+
+# the characters format_text has always replaced
+_ACCENTS = {
+    'a': ['à', 'ã', 'á', 'â'],
+    'e': ['é', 'è', 'ê', 'ë'],
+    'i': ['î', 'ï'],
+    'u': ['ù', 'ü', 'û'],
+    'o': ['ô', 'ö'],
+    '': ['(', ')', '"', '\'']
+}
+# removed characters map to None: str.translate then keeps its fast path on ASCII texts
+FORMAT_TABLE = str.maketrans({special: char or None for (char, special_chars) in _ACCENTS.items() for special in special_chars})
+# str.translate falls back to a lookup per character on the other texts, where a few str.replace are faster
+_REPLACEMENTS = tuple((special, char) for (char, special_chars) in _ACCENTS.items() for special in special_chars)
+
+
+
+class FoldingTable(dict):
+    """
+    FORMAT_TABLE extended to every character on first use: the accents are removed with the NFKD decomposition
+    (ç -> c, ñ -> n, ﬁ -> fi...). Used by str.translate, which only asks for the characters it meets.
+    """
+
+    def __init__(self):
+        super().__init__(FORMAT_TABLE)
+
+    def __missing__(self, code):
+        folded = "".join(char for char in unicodedata.normalize("NFKD", chr(code)) if not unicodedata.combining(char))
+        self[code] = folded = folded.lower().translate(FORMAT_TABLE)
+        return folded
+
+
+
+_table = FORMAT_TABLE
+
+
+def use_accent_folding(enabled: bool):
+    # Switches every normalization to the NFKD folding (or back to the historical table)
+    global _table
+    _table = FoldingTable() if enabled else FORMAT_TABLE
+    format_tags.cache_clear()
+
+
+def accent_folding() -> bool:
+    return _table is not FORMAT_TABLE
+
+
+def format_text(text) -> str:
+    # lower case, without accents, quotes and parentheses
+    text = str(text).strip().lower()
+    if _table is not FORMAT_TABLE or text.isascii():
+        return text.translate(_table)
+    for (special, char) in _REPLACEMENTS:
+        text = text.replace(special, char)
+    return text
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def format_tags(tags: tuple) -> str:
+    # format_text of the list of (category, name) tags of a pixel, shared by the pixels with the same tags
+    return format_text(list(tags))
@@ -0,0 +1,89 @@
+from array import array
+from collections import Counter
+from itertools import chain
+import heapq
+import sys
+
+from normalize import accent_folding, format_text
+
+
+
+MIN_WORD_LETTERS = 3
+
+
+
+class NotesIndex:
+    """
+    Notes tokenized once: each pixel (identified by a key, its day) is stored as an array of token ids,
+    without duplicates. Tokens are interned in a shared vocabulary, excluded words never get an id.
+    """
+
+    def __init__(self, excluded_words=()):
+        self.excluded_words = {format_text(word) for word in excluded_words if word != ""}
+        self.accent_folding = accent_folding()  # the tokens depend on the normalization
+        self.vocabulary = {}  # token -> id
+        self.tokens = []  # id -> token
+        self.pixel_tokens = {}  # key -> array of token ids
+        self._word_ids = {}  # raw word -> token id (None if the word is ignored)
+
+
+    def _word_id(self, word: str):
+        if word.isalpha():
+            long_enough = len(word) >= MIN_WORD_LETTERS
+        else:
+            long_enough = sum(char.isalpha() for char in word) >= MIN_WORD_LETTERS
+        if not long_enough:
+            return None
+        token = format_text(word)
+        if token in self.excluded_words:
+            return None
+        token_id = self.vocabulary.get(token)
+        if token_id is None:
+            token_id = self.vocabulary[token] = len(self.tokens)
+            self.tokens.append(sys.intern(token))
+        return token_id
+
+
+    def tokenize(self, note: str) -> array:
+        word_ids = self._word_ids
+        ids = {}
+        for word in note.split():
+            try:
+                token_id = word_ids[word]
+            except KeyError:
+                token_id = word_ids[word] = self._word_id(word)
+            if token_id is not None:
+                ids[token_id] = None
+        return array('I', ids)
+
+
+    def add(self, key, note: str):
+        self.pixel_tokens[key] = self.tokenize(note)
+
+
+    def remove(self, key):
+        self.pixel_tokens.pop(key, None)
+
+
+    def counts(self, keys=None) -> Counter:
+        # number of pixels using each token id, among the given pixels (all of them by default)
+        arrays = self.pixel_tokens.values() if keys is None else map(self.pixel_tokens.__getitem__, keys)
+        return Counter(chain.from_iterable(arrays))
+
+
+    def top(self, counts: Counter, number_of_words: int, keys=()) -> list:
+        # the most used words, ties in first use order among the pixels of keys (the most recent first): the order of
+        # the counts depends on how they were updated, only the words tied with the last one need to be looked up
+        largest = heapq.nlargest(number_of_words, counts.values())
+        if not largest:
+            return []
+        candidates = {token_id: count for token_id, count in counts.items() if count >= largest[-1]}
+        first_uses = {}
+        for key in keys:
+            for token_id in self.pixel_tokens[key]:
+                if token_id in candidates and token_id not in first_uses:
+                    first_uses[token_id] = len(first_uses)
+            if len(first_uses) == len(candidates):
+                break
+        ranked = sorted(candidates, key=lambda token_id: (-candidates[token_id], first_uses.get(token_id, len(first_uses))))
+        return [(self.tokens[token_id], candidates[token_id]) for token_id in ranked[:number_of_words]]
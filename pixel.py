@@ -1,9 +1,61 @@
 from datetime import datetime, timedelta, date
 from styles import *
+from store import PixelStore, date_to_ordinal
+from tag_registry import TAGS
+from stats import StatsAccumulator, merge_summaries, runs_streaks
+from search_index import SearchIndex
+from trends import MoodSeries
+from correlations import TermMatrix
+from normalize import format_text, format_tags, use_accent_folding
+from tagger import tag_pixels
+from report import Report, TerminalOutput, OUTPUTS, report_paths
+from grid import render_grid, render_month, month_bounds, previous_month
+from backup_reader import iter_backup
+from serializers import dump_backup, SERIALIZERS
+from merge import merge_backups, POLICIES
+from database import PixelDatabase, database_path
+from background import FutureStore, build_index
+import journal
+import cache
+import profiling
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import calendar
+import shlex
 import glob
 import json
-import os, re
-
+import gc
+import time
+import sys
+from array import array
+from functools import lru_cache
+import os
+
+
+# Append the changes to a journal next to the backup instead of rewriting it, the backup is updated on exit
+JOURNAL_MODE = False
+# Keep a parsed copy of the backup next to it (.cache), to start faster next time
+CACHE_PIXELS = True
+# Format of the backups written: "pretty" (indented, as until now), "compact" (half the size)
+# or "orjson" (compact, faster when the orjson package is installed)
+BACKUP_FORMAT = "pretty"
+# Show the menu while the backup is loaded in the background (then the search index and the statistics)
+BACKGROUND_LOADING = True
+# Also remove the accents format_text doesn't list (ç, ñ, å...) in the searches, tags and statistics
+FOLD_ACCENTS = False
+use_accent_folding(FOLD_ACCENTS)
+# Files written by the statistics, in the statistics folder: "txt", "json" and/or "csv"
+REPORT_FORMATS = ["txt"]
+
+# Rolling windows of the statistics, in days up to the last pixel (each calendar year is reported too)
+STATS_DAYS = [7, 30, 365]
+# Moving average of the mood trends and of the searches (in days), and half-life of the trend (in days)
+TREND_DAYS = 30
+TREND_HALF_LIFE = 14
+# Days reported as unusual: their mood is at least ANOMALY_THRESHOLD standard deviations from the TREND_DAYS before
+ANOMALY_THRESHOLD = 2.0
+# Words and tags compared to the mood only when used in at least CORRELATION_MIN_PIXELS pixels
+CORRELATION_MIN_PIXELS = 10
 
 
 #######################
@@ -28,28 +80,45 @@ def is_date_valid(date: str) -> bool:
         return False
     
 
-def format_text(text):
-    accents = {
-        'a': ['à', 'ã', 'á', 'â'],
-        'e': ['é', 'è', 'ê', 'ë'],
-        'i': ['î', 'ï'],
-        'u': ['ù', 'ü', 'û'],
-        'o': ['ô', 'ö'],
-        '': ['(', ')', '"', '\'']
-    }
-    text = str(text).strip().lower()
-    for (char, special_chars) in accents.items():
-        for special in special_chars:
-            text = text.replace(special, char)
-    return text
-
-
-def print_and_write(text, file_path, STYLE=""):
-    print(STYLE + text + RESET)
-    with open(file_path, "a", encoding='utf-8') as file:
-        if STYLE == UNDERLINE:
-            file.write("\n____________________")
-        file.write(text + "\n")
+def parse_date(date: str) -> str:
+    # argparse type of the dates given on the command line
+    if not is_date_valid(date.strip()):
+        raise argparse.ArgumentTypeError(f"invalid date '{date}', use YYYY-MM-DD")
+    return date.strip()
+
+
+class SearchValue(argparse.Action):
+    # the values of "search date" and "search mood" are checked like the dates and moods of "write" (by is parsed before it)
+    def __call__(self, parser, namespace, value, option_string=None):
+        if namespace.by == "date":
+            try:
+                value = parse_date(value)
+            except argparse.ArgumentTypeError as error:
+                raise argparse.ArgumentError(self, str(error))
+        elif namespace.by == "mood":
+            if value.strip() not in ("1", "2", "3", "4", "5"):
+                raise argparse.ArgumentError(self, f"invalid mood '{value}', use 1-5")
+            value = value.strip()
+        setattr(namespace, self.dest, value)
+
+
+def parse_workers(workers: str) -> int:
+    # argparse type of --workers: a number of processes
+    try:
+        number = int(workers)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"invalid number of workers '{workers}', use 1 or more")
+    return number
+
+
+def parse_tag(tag: str) -> tuple:
+    # "tagCategory,tagName", or "tagName" for a tag of the Emotions category
+    parts = tag.split(",")
+    if len(parts) == 2:
+        return (parts[0].strip(), parts[1].strip())
+    return ("Emotions", tag.strip())
 
 
 def calculate_average(pixels):
@@ -64,11 +133,15 @@ def calculate_average(pixels):
 #     Pixels file     #
 #######################
 
-def find_pixel_file():
+def find_pixel_file(interactive=True):
     pattern = "*.json"
     files = glob.glob(pattern)
     files.sort()  # Trie les fichiers par ordre croissant
 
+    if not interactive:
+        # the only backup of the directory, None if there is none or several
+        return files[0] if len(files) == 1 else None
+
     if not files:
         print("No JSON file found in current directory.")
         choice = input("Do you want to create a new JSON file ? (y/n): ")
@@ -100,28 +173,90 @@ def find_pixel_file():
 
 
 
-def load_pixels():
-    pixel_file = find_pixel_file()
-    with open(pixel_file, "r", encoding='utf-8') as f:
-        pixels = json.load(f)
+def iter_pixels(pixel_file):
+    # Streams the pixels of a backup, skipping duplicates (same day in {"date" :})
+    dates_added = set()
+    with open(pixel_file, "r", encoding='utf-8') as file:
+        for raw_pixel in iter_backup(file):
+            if raw_pixel["date"] not in dates_added:
+                dates_added.add(raw_pixel["date"])
+                yield Pixel(pixel=raw_pixel)
 
-    # delete duplicates (same day in {"date" :})
-    filtered_pixels = []
-    dates_added = {}
-    for pixel in pixels:
-        if pixel["date"] not in dates_added.keys():
-            filtered_pixels.append(pixel)
-            dates_added[pixel["date"]] = 1
-    
-    return pixel_file, [Pixel(pixel=pixel) for pixel in filtered_pixels]
 
+@profiling.timed()
+def load_pixels(pixel_file=None, cached=True):
+    # cached=False: no cache read or written, for the backups of a directory that may not be ours
+    cached = cached and CACHE_PIXELS
+    if pixel_file is None:
+        pixel_file = find_pixel_file()
 
+    # the pixels don't reference each other: the garbage collector would only slow down their creation
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        pixels = load_cached_pixels(pixel_file) if cached else None
+        if pixels is None:
+            pixels = PixelStore(iter_pixels(pixel_file))
+            if cached:
+                save_cached_pixels(pixels, pixel_file)
+        replay_journal(pixels, pixel_file)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    profiling.count("pixels loaded", len(pixels))
+    return pixel_file, pixels
+
+
+def load_cached_pixels(pixel_file):
+    data = cache.load(pixel_file)
+    if data is None:
+        return None
+    pixels = PixelStore(Pixel.from_fields(*fields) for fields in data["pixels"])
+    if data.get("stats") is not None:
+        track_statistics(pixels, data["stats"])  # updated by the journal replay
+    return pixels
+
+
+def save_cached_pixels(pixels, pixel_file):
+    # the cache only covers the backup file, the journal is replayed on top of it
+    cache.save(pixel_file, {"pixels": [pixel.fields() for pixel in pixels], "stats": pixels.indexes.get("stats")})
+
+
+@profiling.timed()
 def write_to_json(pixels, pixel_file):
 
-    with open(pixel_file, 'w', encoding='utf-8') as file:
-        json.dump(pixels, file, cls=PixelEncoder, ensure_ascii=False, indent=4)
+    journal.write_atomic(pixel_file, lambda file: dump_backup(file, (pixel.backup_dict() for pixel in pixels), BACKUP_FORMAT))
+    journal.clear(pixel_file)  # the journal is now part of the file
+    if CACHE_PIXELS and "stats" in pixels.indexes:
+        save_cached_pixels(pixels, pixel_file)  # keeps the statistics for the next start
 
     print("\n>Pixels file updated!\n")
+
+
+def save_changes(pixels, pixel_file, records):
+    if JOURNAL_MODE:
+        journal.append_records(pixel_file, records)
+        print("\n>Pixels journal updated!\n")
+    else:
+        write_to_json(pixels, pixel_file)
+
+
+def replay_journal(pixels, pixel_file):
+    # Applies the changes saved in the journal on top of the backup (replaying twice gives the same result)
+    for record in journal.read_records(pixel_file):
+        if record["op"] == "pixel":
+            pixels.add(Pixel(pixel=record["pixel"]))
+        elif record["op"] == "tags":
+            pixel = pixels.get(record["date"])
+            if pixel is not None:
+                pixel.add_tags(record["tags"])
+                pixels.touch(pixel)
+
+
+def compact_journal(pixels, pixel_file):
+    # Folds the journal back into the backup
+    if journal.has_records(pixel_file):
+        write_to_json(pixels, pixel_file)
     
 
 #####################
@@ -129,9 +264,29 @@ def write_to_json(pixels, pixel_file):
 #####################
 
 
-def display_pixels_month(pixels, number_to_display):
-    # Not implemented (feel free to PR)
-    pass
+def display_pixels_month(pixels, month, number_to_display):
+    # Calendars of number_to_display months, up to month ("YYYY-MM", the month of the last pixel by default)
+    if len(pixels) == 0:
+        print("No pixel found")
+        return
+    try:
+        year, month = (int(part) for part in month.strip().split("-")[:2])
+        month_bounds(year, month)
+    except ValueError:
+        last_day = date.fromordinal(pixels.last(1)[0].ordinal)
+        year, month = last_day.year, last_day.month
+    try:
+        number_to_display = max(1, int(number_to_display))
+    except ValueError:
+        number_to_display = 1
+
+    months = []
+    for _ in range(number_to_display):
+        months.append((year, month))
+        year, month = previous_month(year, month)
+
+    calendars = [render_month(pixels.range(*month_bounds(year, month)), year, month) for year, month in reversed(months)]
+    sys.stdout.write("\n".join(calendars))
 
 
 def display_pixels_year(pixels, number_to_display):
@@ -142,44 +297,77 @@ def display_pixels_year(pixels, number_to_display):
     except ValueError:
         number_to_display = len(pixels)
 
-    pixels_2_display = pixels.copy()
-    pixels_2_display = pixels_2_display[-number_to_display:]
+    sys.stdout.write(render_grid(pixels.last(number_to_display)))
 
-    display_grid = {}
 
-    for pixel in pixels_2_display:
-        date = pixel.date.split("-")
-        year = date[0]
-        month = date[1]
-        day = date[2]
-        if display_grid.get((year, month)) is None:
-            display_grid[(year, month)] = [0] * 31
-        display_grid[(year, month)][int(day)-1] = get_color_of_mood(pixel.scores)
+def display_pixels_of_year(pixels, year):
+    try:
+        year = int(year)
+    except ValueError:
+        year = datetime.now().year
+    pixels_2_display = pixels.range(date(year, 1, 1), date(year, 12, 31))
+    if len(pixels_2_display) == 0:
+        print("No pixel found")
+    sys.stdout.write(render_grid(pixels_2_display))
 
-    # display the grid
-    months_sorted = sorted(display_grid.keys())
 
-    for month in months_sorted:
-        days = display_grid[month]
-        for day in days:
-            if day == 0:
-                print("  ", end='')
-            else:
-                print(day + PIXEL_CHAR + RESET, end='')
-        print()
+def display_pixels_days(pixels, number_of_days):
+    # Grid of the last number_of_days days, today included
+    try:
+        number_of_days = max(1, int(number_of_days))
+    except ValueError:
+        number_of_days = 30
+    today = date.today()
+    pixels_2_display = pixels.range(today - timedelta(days=number_of_days-1), today)
+    if len(pixels_2_display) == 0:
+        print("No pixel found")
+    sys.stdout.write(render_grid(pixels_2_display))
+
+
+
+def read_excluded_words():
+    with open("excluded_words.txt", "a", encoding='utf-8') as _:
+        pass # creating the file if it doesn't exist
+    with open("excluded_words.txt", "r", encoding='utf-8') as file:
+        return file.read().split("\n")
+
+
+def get_statistics(pixels, excluded_words, pixel_file=None):
+    # Built on the first statistics (or restored from the cache), then kept up to date by the store
+    statistics = pixels.indexes.get("stats")
+    if statistics is None or not statistics.same_settings(excluded_words):
+        statistics = StatsAccumulator.build(pixels, excluded_words)
+        track_statistics(pixels, statistics)
+        if pixel_file is not None and CACHE_PIXELS and not journal.has_records(pixel_file):
+            save_cached_pixels(pixels, pixel_file)  # the pixels are the ones of the backup: the cache can keep the statistics
+    return statistics
+
 
+def track_statistics(pixels, statistics):
+    if "stats" not in pixels.indexes:
+        pixels.subscribe(lambda pixel: pixels.indexes["stats"].update(pixel))
+    pixels.indexes["stats"] = statistics
 
 
-def display_statistics(pixels, number_of_words):
+def get_mood_series(pixels):
+    # Built when needed, then built again after any change of the pixels
+    series = pixels.indexes.get("trends")
+    if series is None:
+        if "trends" not in pixels.indexes:
+            pixels.subscribe(lambda pixel: pixels.indexes.update(trends=None))
+        series = pixels.indexes["trends"] = MoodSeries.from_pixels(pixels.sorted())
+    return series
 
-    MAX_YEARS = 10
+
+@profiling.timed()
+def display_statistics(pixels, number_of_words, formats=REPORT_FORMATS, terminal=True, pixel_file=None):
 
     # create a folder for the statistics
     if not os.path.exists("statistics"):
         os.makedirs("statistics")
 
     TIME_KEY = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    file_path = f"statistics/{TIME_KEY}.txt"
+    file_paths = report_paths(f"statistics/{TIME_KEY}", formats)
 
     try:
         number_of_words = int(number_of_words)
@@ -188,182 +376,265 @@ def display_statistics(pixels, number_of_words):
     except:
         number_of_words = 5
 
-    pixels_stats = pixels.copy()
-    pixels_stats = sorted(pixels_stats, key=lambda pixel: datetime.strptime(pixel.date, "%Y-%m-%d"), reverse=True)
-
-
-    print_and_write("\nGeneral statistics:", file_path, UNDERLINE)
-    
-    dates = [datetime.strptime(pixel.date, "%Y-%m-%d") for pixel in pixels_stats]
-    longest_streak = 1
-    last_streak = 1
-    for i in range(1, len(dates)):
-        if dates[i-1] == dates[i] + timedelta(days=1):
-            last_streak += 1
-        else:
-            last_streak = 0
+    if not hasattr(pixels, "indexes"):  # a list of pixels
+        pixels = PixelStore(pixels)
+    if len(pixels) == 0:
+        print("No pixel found")
+        return
 
-        if last_streak > longest_streak:
-            longest_streak = last_streak
+    laps = profiling.laps("display_statistics")
+    laps.lap("computing")
+    statistics = get_statistics(pixels, read_excluded_words(), pixel_file)
+    all_pixels = statistics.all
+    number_of_pixels = len(statistics)
+    rolling_windows = [(f"the last {days} days", statistics.last_days(days)) for days in STATS_DAYS]
+    years = statistics.years()
+    # windows whose tops are reported: those not covering all the pixels, the most recent year first
+    windows = [(name, window) for name, window in rolling_windows if 0 < window.number_of_pixels < number_of_pixels]
+    if len(years) > 1:
+        windows += [(str(year), statistics.year(year)) for year in reversed(years)]
 
-    totals_days = (dates[0] - dates[-1]).days + 1
-    days_missed = totals_days - len(pixels_stats)
+    outputs = [OUTPUTS[report_format](file_path) for report_format, file_path in zip(formats, file_paths)]
+    if terminal:
+        outputs.insert(0, TerminalOutput())
+    report = Report(outputs)
 
 
-    print_and_write(f"Number of pixels: {len(pixels_stats)}", file_path)
-    print_and_write(f"First pixel: {pixels_stats[-1].date}", file_path)
-    print_and_write(f"Longest streak: {longest_streak}", file_path)
-    print_and_write(f"Current streak: {last_streak}", file_path)
-    print_and_write(f"Number of pixels missed since the first pixel: {days_missed} ({days_missed/totals_days*100:.2f}%)", file_path)
+    laps.lap("general")
+    report.section("General statistics")
 
+    longest_streak, last_streak = statistics.streaks()
+    totals_days = statistics.total_days()
+    days_missed = statistics.days_missed()
+    first_pixel = datetime_to_string(date.fromordinal(statistics.ordinals[0]))
 
-    print_and_write("\nMood statistics:", file_path, UNDERLINE)
-    moods_occurence = {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
-    avg_mood = 0
-    avg_mood_7 = 0
-    avg_mood_30 = 0
-    avg_mood_365 = 0
 
-    for i, pixel in enumerate(pixels_stats):
-        for pix in pixel.scores:
-            moods_occurence[str(pix)] += 1
+    report.line(f"Number of pixels: {number_of_pixels}", label="Number of pixels", value=number_of_pixels)
+    report.line(f"First pixel: {first_pixel}", label="First pixel", value=first_pixel)
+    report.line(f"Longest streak: {longest_streak}", label="Longest streak", value=longest_streak)
+    report.line(f"Current streak: {last_streak}", label="Current streak", value=last_streak)
+    report.line(f"Number of pixels missed since the first pixel: {days_missed} ({days_missed/totals_days*100:.2f}%)",
+                label="Pixels missed", value=days_missed, percent=round(days_missed/totals_days*100, 2))
 
-        mood = sum(int(pix) for pix in pixel.scores) / len(pixel.scores)
-        if i < 7:
-            avg_mood_7 += mood
-        if i < 30:
-            avg_mood_30 += mood
-        if i < 365:
-            avg_mood_365 += mood
-        avg_mood += mood
 
-    avg_mood = round(avg_mood / len(pixels_stats), 2)
-    avg_mood_7 = round(avg_mood_7 / min(len(pixels_stats), 7), 2)
-    avg_mood_30 = round(avg_mood_30 / min(len(pixels_stats), 30), 2)
-    avg_mood_365 = round(avg_mood_365 / min(len(pixels_stats), 365), 2)
+    laps.lap("moods")
+    report.section("Mood statistics")
+    avg_mood = round(all_pixels.average_mood(), 2)
 
     for mood in range(5, 0, -1):
         MOOD_COLOR = get_color_of_mood([mood])
-        mood_percentage = round(100 * moods_occurence[str(mood)] / len(pixels_stats), 2)
-        print_and_write(f" {mood}: {moods_occurence[str(mood)]} ({mood_percentage}%)", file_path, MOOD_COLOR)
+        mood_percentage = round(100 * all_pixels.mood_counts[mood] / number_of_pixels, 2)
+        report.line(f" {mood}: {all_pixels.mood_counts[mood]} ({mood_percentage}%)", MOOD_COLOR,
+                    label=mood, value=all_pixels.mood_counts[mood], percent=mood_percentage)
 
 
-    print_and_write(f"Average mood ({len(pixels_stats)} days): {avg_mood}", file_path)
-    print_and_write(f"Average mood of the last 7 days: {avg_mood_7}", file_path)
-    print_and_write(f"Average mood of the last 30 days: {avg_mood_30}", file_path)
-    print_and_write(f"Average mood of the last 365 days: {avg_mood_365}", file_path)
+    report.line(f"Average mood ({number_of_pixels} days): {avg_mood}", label="Average mood", value=avg_mood)
+    for name, window in rolling_windows:
+        window_avg_mood = round(window.average_mood(), 2)
+        report.line(f"Average mood of {name}: {window_avg_mood}", label=f"Average mood of {name}", value=window_avg_mood)
     
 
-    print_and_write("\nNotes statistics:", file_path, UNDERLINE)
-    top_words = {}
-    top_words_7 = {}
-    top_words_30 = {}
-    top_words_by_year = [{} for _ in range(MAX_YEARS)]
-
-    with open("excluded_words.txt", "a", encoding='utf-8') as _:
-        pass # creating the file if it doesn't exist
-    excluded_words = []
-    with open("excluded_words.txt", "r", encoding='utf-8') as file:
-        excluded_words = file.read().split("\n")
-    excluded_words = [format_text(word) for word in excluded_words if word != ""]
-
-    for i, pixel in enumerate(pixels_stats):
-        current_words = set()
-        note = pixel.notes
-        for word in note.split():
-            alpha_word = ''.join(char for char in word if char.isalpha())
-            if len(alpha_word) >= 3:
-                cleaned_word = format_text(word)
-                if cleaned_word not in excluded_words:
-                    current_words.add(cleaned_word)
-
-        for word in current_words:
-
-            top_words[word] = top_words.get(word, 0) + 1
-            if i < 7:
-                top_words_7[word] = top_words_7.get(word, 0) + 1
-            if i < 30:
-                top_words_30[word] = top_words_30.get(word, 0) + 1
-            if i < 365 * MAX_YEARS:
-                top_words_by_year[i//365][word] = top_words_by_year[i//365].get(word, 0) + 1
-        
-
-    print_and_write(f"Top {number_of_words} words of all time:", file_path)
-    for word, count in sorted(top_words.items(), key=lambda item: item[1], reverse=True)[:number_of_words]:
-        print_and_write(f" - {word.capitalize()} : {count} ({100 * count / len(pixels_stats):.2f}%)", file_path)
-
-    if (len(top_words_7) > 0) and (len(top_words_7) != len(top_words)):
-        print_and_write(f"Top {number_of_words} words of the last 7 days:", file_path)
-        for word, count in sorted(top_words_7.items(), key=lambda item: item[1], reverse=True)[:number_of_words]:
-            print_and_write(f" - {word.capitalize()} : {count} ({100 * count / min(len(pixels_stats), 7):.1f}%)", file_path)
-
-    if (len(top_words_30) > 7) and (len(top_words_30) != len(top_words)):
-        print_and_write(f"Top {number_of_words} words of the last 30 days:", file_path)
-        for word, count in sorted(top_words_30.items(), key=lambda item: item[1], reverse=True)[:number_of_words]:
-            print_and_write(f" - {word.capitalize()} : {count} ({100 * count / min(len(pixels_stats), 30):.1f}%)", file_path)
-
-    for i, top_words_year in enumerate(top_words_by_year):
-        if (len(top_words_year) > 0) and (i != 0 or len(top_words_year) != len(top_words)):
-            print_and_write(f"Top {number_of_words} words of the year{f'-{i}' if i != 0 else ''}:", file_path)
-            for word, count in sorted(top_words_year.items(), key=lambda item: item[1], reverse=True)[:number_of_words]:
-                print_and_write(f" - {word.capitalize()} : {count} ({100 * count / min(len(pixels_stats), 365):.1f}%)", file_path)
-
-    print_and_write("\nTags statistics:", file_path, UNDERLINE)
-    top_tags = {}
-    top_tags_7 = {}
-    top_tags_30 = {}
-    top_tags_by_year = [{} for _ in range(MAX_YEARS)]
-
-    for i, pixel in enumerate(pixels_stats):
-        for categoryName, tag in pixel.tags:
-            for tag_key in top_tags.keys():
-                if tag_key.split(" ")[0].lower() == tag.lower():
-                    tag = tag_key
-                    break
-
-            if not tag.endswith(")"):
-                tag = f"{tag} ({categoryName})"
-            top_tags[tag] = top_tags.get(tag, 0) + 1
-            if i < 7:
-                top_tags_7[tag] = top_tags_7.get(tag, 0) + 1
-            if i < 30:
-                top_tags_30[tag] = top_tags_30.get(tag, 0) + 1
-            if i < 365 * MAX_YEARS:
-                top_tags_by_year[i//365][tag] = top_tags_by_year[i//365].get(tag, 0) + 1
+    laps.lap("trends")
+    report.section("Mood trends")
+    series = get_mood_series(pixels)
+    last_day = statistics.ordinals[-1]
+    trend = round(series.value_at(series.trend(TREND_HALF_LIFE), last_day), 2)
+    moving_average = round(series.value_at(series.moving_average(TREND_DAYS), last_day), 2)
+    report.line(f"Mood trend (half-life of {TREND_HALF_LIFE} days): {trend}", label="Mood trend", value=trend)
+    report.line(f"Moving average of the last {TREND_DAYS} days: {moving_average}", label="Moving average", value=moving_average)
+
+    report.subsection("Average mood by day of the week:")
+    for weekday, weekday_mood in zip(calendar.day_name, series.weekday_means()):
+        if weekday_mood is not None:
+            report.line(f" - {weekday} : {weekday_mood:.2f}", label=weekday, value=round(weekday_mood, 2))
+
+    report.subsection("Average mood by month:")
+    for month, month_mood in zip(calendar.month_name[1:], series.month_means()):
+        if month_mood is not None:
+            report.line(f" - {month} : {month_mood:.2f}", label=month, value=round(month_mood, 2))
+
+    anomalies = series.anomalies(TREND_DAYS, ANOMALY_THRESHOLD)[:number_of_words]
+    if anomalies:
+        report.subsection(f"Top {len(anomalies)} unusual days:")
+        for ordinal, day_mood, score in anomalies:
+            day = datetime_to_string(date.fromordinal(ordinal))
+            report.line(f" - {day} : {day_mood:.2f} ({score:+.1f} standard deviations from the last {TREND_DAYS} days)",
+                        label=day, value=round(day_mood, 2))
+
+
+    laps.lap("notes")
+    report.section("Notes statistics")
+    report.subsection(f"Top {number_of_words} words of all time:")
+    for word, count in statistics.top_words(all_pixels, number_of_words):
+        percent = round(100 * count / number_of_pixels, 2)
+        report.line(f" - {word.capitalize()} : {count} ({percent:.2f}%)", label=word, value=count, percent=percent)
+
+    for name, window in windows:
+        if len(window.words) > 0:
+            report.subsection(f"Top {number_of_words} words of {name}:")
+            for word, count in statistics.top_words(window, number_of_words):
+                percent = round(100 * count / window.number_of_pixels, 1)
+                report.line(f" - {word.capitalize()} : {count} ({percent:.1f}%)", label=word, value=count, percent=percent)
+
+    laps.lap("tags")
+    report.section("Tags statistics")
+    tag_names = statistics.tag_names()
+    top_tags = statistics.tag_counts(all_pixels, tag_names)
 
     number_of_tags = 5
-    print_and_write(f"Top {number_of_tags} tags:", file_path)
+    report.subsection(f"Top {number_of_tags} tags:")
     for tag, count in sorted(top_tags.items(), key=lambda item: item[1], reverse=True)[:number_of_tags]:
-        print_and_write(f" - {tag.capitalize()} : {count} ({100 * count / len(pixels_stats):.1f}%)", file_path)
+        percent = round(100 * count / number_of_pixels, 1)
+        report.line(f" - {tag.capitalize()} : {count} ({percent:.1f}%)", label=tag, value=count, percent=percent)
+
+    for name, window in windows:
+        top_tags_window = statistics.tag_counts(window, tag_names)
+        if len(top_tags_window) > 0:
+            report.subsection(f"Top {number_of_tags} tags of {name}:")
+            for tag, count in sorted(top_tags_window.items(), key=lambda item: item[1], reverse=True)[:number_of_tags]:
+                percent = round(100 * count / window.number_of_pixels, 1)
+                report.line(f" - {tag.capitalize()} : {count} ({percent:.1f}%)", label=tag, value=count, percent=percent)
+
+    # pairs among the most used tags
+    tag_pairs = statistics.tag_pairs(all_pixels, tag_names, 2 * number_of_tags)[:number_of_tags]
+    if tag_pairs:
+        report.subsection(f"Top {number_of_tags} tags used together:")
+        for tag, other_tag, count in tag_pairs:
+            percent = round(100 * count / number_of_pixels, 1)
+            report.line(f" - {tag.capitalize()} + {other_tag.capitalize()} : {count} ({percent:.1f}%)",
+                        label=f"{tag} + {other_tag}", value=count, percent=percent)
+
+    laps.lap("correlations")
+    report.section("Words and tags of the best and worst days")
+    correlations = TermMatrix.from_statistics(statistics, tag_names).correlations(CORRELATION_MIN_PIXELS)
+    best_terms = [term for term in correlations if term[3] > 1][:number_of_words]
+    worst_terms = [term for term in reversed(correlations) if term[3] < 1][:number_of_words]
+    for title, terms in ((f"Top {number_of_words} words and tags of the best days:", best_terms),
+                         (f"Top {number_of_words} words and tags of the worst days:", worst_terms)):
+        if terms:
+            report.subsection(title)
+            for term, count, mean_mood, lift, support in terms:
+                percent = round(100 * support, 1)
+                report.line(f" - {term.capitalize()} : average mood {mean_mood:.2f} ({lift - 1:+.1%}), {count} pixels ({percent:.1f}%)",
+                            label=term, value=round(mean_mood, 2), percent=percent)
+    if not best_terms and not worst_terms:
+        report.line(f"No word or tag used in at least {CORRELATION_MIN_PIXELS} pixels")
+
+    laps.lap("saving")
+    report.close()
+    laps.stop()
+    if file_paths:
+        saved_files = ", ".join(f"'{file_path}'" for file_path in file_paths)
+        print(f"\n\nStatistics saved in {saved_files}")
+
+
+def analyze_backup(pixel_file, excluded_words):
+    # Statistics of one backup, run in a worker process by display_backups_statistics
+    # without cache: unpickling a .cache found next to a backup of any directory could run any code
+    try:
+        start_time = time.perf_counter()
+        _, pixels = load_pixels(pixel_file, cached=False)
+        load_time = time.perf_counter() - start_time
+        summary = get_statistics(pixels, excluded_words).summary()
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        return {"file": pixel_file, "error": str(error)}
+    summary.update(file=pixel_file, load_time=load_time, stats_time=time.perf_counter() - start_time - load_time)
+    return summary
 
-    if (len(top_tags_7) > 0) and (len(top_tags_7) != len(top_tags)):
-        print_and_write(f"Top {number_of_tags} tags of the last 7 days:", file_path)
-        for tag, count in sorted(top_tags_7.items(), key=lambda item: item[1], reverse=True)[:number_of_tags]:
-            print_and_write(f" - {tag.capitalize()} : {count} ({100 * count / min(len(pixels_stats), 7):.1f}%)", file_path)
 
-    if (len(top_tags_30) > 0) and (len(top_tags_30) != len(top_tags_7)):
-        print_and_write(f"Top {number_of_tags} tags of the last 30 days:", file_path)
-        for tag, count in sorted(top_tags_30.items(), key=lambda item: item[1], reverse=True)[:number_of_tags]:
-            print_and_write(f" - {tag.capitalize()} : {count} ({100 * count / min(len(pixels_stats), 30):.1f}%)", file_path)
+def display_backups_statistics(directory=".", number_of_words=5, workers=None, formats=REPORT_FORMATS, terminal=True):
+    # Statistics of every backup of a directory, analyzed in parallel, then of all of them together
 
-    for i, top_tags_year in enumerate(top_tags_by_year):
-        if (len(top_tags_year) > 0) and (i != 0 or len(top_tags_year) != len(top_tags)):
-            print_and_write(f"Top {number_of_tags} tags of the year{f'-{i}' if i != 0 else ''}:", file_path)
-            for tag, count in sorted(top_tags_year.items(), key=lambda item: item[1], reverse=True)[:number_of_tags]:
-                print_and_write(f" - {tag.capitalize()} : {count} ({100 * count / min(len(pixels_stats), 365):.1f}%)", file_path)
+    pixel_files = sorted(glob.glob(os.path.join(directory, "*.json")))
+    if not pixel_files:
+        print("No JSON file found in the directory")
+        return
+
+    if not os.path.exists("statistics"):
+        os.makedirs("statistics")
+    TIME_KEY = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    file_paths = report_paths(f"statistics/backups_{TIME_KEY}", formats)
 
-    print(f"\n\nStatistics saved in '{file_path}'")
+    start_time = time.perf_counter()
+    excluded_words = read_excluded_words()
+    workers = min(workers or os.cpu_count() or 1, len(pixel_files))
+    if workers == 1:
+        summaries = [analyze_backup(pixel_file, excluded_words) for pixel_file in pixel_files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            summaries = list(executor.map(analyze_backup, pixel_files, [excluded_words] * len(pixel_files)))
+    elapsed_time = time.perf_counter() - start_time
+
+    outputs = [OUTPUTS[report_format](file_path) for report_format, file_path in zip(formats, file_paths)]
+    if terminal:
+        outputs.insert(0, TerminalOutput())
+    report = Report(outputs)
+
+    failed = [summary for summary in summaries if "error" in summary]
+    summaries = [summary for summary in summaries if "error" not in summary]
+    for summary in summaries:
+        report.section(f"Backup {os.path.basename(summary['file'])}")
+        average_mood = round(summary["moods_sum"] / summary["pixels"], 2) if summary["pixels"] else 0
+        first_pixel = datetime_to_string(date.fromordinal(summary["first_day"])) if summary["pixels"] else "-"
+        report.line(f"Number of pixels: {summary['pixels']}", label="Number of pixels", value=summary["pixels"])
+        report.line(f"First pixel: {first_pixel}", label="First pixel", value=first_pixel)
+        report.line(f"Longest streak: {summary['longest_streak']}", label="Longest streak", value=summary["longest_streak"])
+        report.line(f"Current streak: {summary['current_streak']}", label="Current streak", value=summary["current_streak"])
+        report.line(f"Average mood: {average_mood}", label="Average mood", value=average_mood)
+        report.line(f"Loaded in {summary['load_time']:.2f}s, statistics in {summary['stats_time']:.2f}s",
+                    label="Seconds", value=round(summary["load_time"] + summary["stats_time"], 3))
+    for summary in failed:
+        report.section(f"Backup {os.path.basename(summary['file'])}")
+        report.line(f"Not analyzed: {summary['error']}", RED)
+
+    merged = merge_summaries(summaries)
+    number_of_pixels = merged["pixels"]
+    report.section("All backups")
+    report.line(f"Number of backups: {merged['backups']}", label="Number of backups", value=merged["backups"])
+    report.line(f"Number of pixels: {number_of_pixels}", label="Number of pixels", value=number_of_pixels)
+    report.line(f"Longest streak: {merged['longest_streak']}", label="Longest streak", value=merged["longest_streak"])
+    if merged["backups"]:
+        average_streak = round(merged["current_streaks"] / merged["backups"], 1)
+        report.line(f"Average current streak: {average_streak}", label="Average current streak", value=average_streak)
+    report.line(f"Analyzed in {elapsed_time:.2f}s with {workers} worker{'s' if workers > 1 else ''}",
+                label="Seconds", value=round(elapsed_time, 3))
+
+    if number_of_pixels:
+        report.subsection("Moods:")
+        for mood in range(5, 0, -1):
+            mood_percentage = round(100 * merged["mood_counts"][mood] / number_of_pixels, 2)
+            report.line(f" {mood}: {merged['mood_counts'][mood]} ({mood_percentage}%)", get_color_of_mood([mood]),
+                        label=mood, value=merged["mood_counts"][mood], percent=mood_percentage)
+        average_mood = round(merged["moods_sum"] / number_of_pixels, 2)
+        report.line(f"Average mood: {average_mood}", label="Average mood", value=average_mood)
+
+        report.subsection(f"Top {number_of_words} words:")
+        for word, count in merged["words"].most_common(number_of_words):
+            percent = round(100 * count / number_of_pixels, 2)
+            report.line(f" - {word.capitalize()} : {count} ({percent:.2f}%)", label=word, value=count, percent=percent)
+
+        report.subsection("Top 5 tags:")
+        for tag, count in merged["tags"].most_common(5):
+            percent = round(100 * count / number_of_pixels, 1)
+            report.line(f" - {tag.capitalize()} : {count} ({percent:.1f}%)", label=tag, value=count, percent=percent)
+
+    report.close()
+    if file_paths:
+        saved_files = ", ".join(f"'{file_path}'" for file_path in file_paths)
+        print(f"\n\nStatistics saved in {saved_files}")
 
 
 ######################
 #       Checks       #
 ######################
 
-def get_aviability(pixels, date: str) -> str:
-    return search_pixel_by_date(pixels, date) == "No pixel found"
+def get_aviability(pixels, date: str) -> bool:
+    return date not in pixels
 
 def get_color_aviability(pixels, date: str) -> str:
-    if search_pixel_by_date(pixels, date) == "No pixel found":
+    if isinstance(pixels, FutureStore) and not pixels.ready():
+        return ""  # not worth waiting for the pixels
+    if get_aviability(pixels, date):
         return GREEN
     else:
         return RED
@@ -373,55 +644,74 @@ def get_color_aviability(pixels, date: str) -> str:
 #   Search functions   #
 ########################
 
-def search_pixel_by_date(pixels, search_date):
-    search_date = datetime_to_string(datetime.strptime(search_date, "%Y-%m-%d"))
-    matching_pixels = []
+def get_search_index(pixels):
+    # Built on the first search, then kept up to date by the store
+    search_index = pixels.indexes.get("search")
+    if search_index is None:
+        search_index = pixels.indexes["search"] = build_search_index(pixels)
+        pixels.subscribe(search_index.update)
+    return search_index
+
+
+def build_search_index(pixels):
+    search_index = SearchIndex(format_text, format_tags)
     for pixel in pixels:
-        if pixel.date == search_date:
-            matching_pixels.append(pixel)
-            break
+        search_index.update(pixel)
+    profiling.count("pixels indexed", len(pixels))
+    return search_index
+
+
+def print_relative_mood(pixels, matching_pixels):
+    # mood of the pixels found compared to the TREND_DAYS days before each of them
+    relative_mood = get_mood_series(pixels).relative_mood([pixel.ordinal for pixel in matching_pixels], TREND_DAYS)
+    if relative_mood is not None:
+        print(f"Compared to the {TREND_DAYS} days before them : {relative_mood:+.2f}")
 
-    # Returns the first pixel found instead of printing it because it's used in the get_aviability function    
-    return matching_pixels[0] if matching_pixels else "No pixel found" 
+
+@profiling.timed()
+def search_pixel_by_date(pixels, search_date):
+    # Returns the pixel instead of printing it
+    return pixels.get(search_date, "No pixel found")
 
 
+@profiling.timed()
 def search_pixel_by_mood(pixels, search_mood, number_of_pixels):
     matching_pixels = []
     for pixel in pixels:
         if any(str(p) == str(search_mood) for p in pixel.scores):
             matching_pixels.append(pixel)
+    profiling.count("pixels scanned", len(pixels))
     if len(matching_pixels) > 0:
         for pixel in matching_pixels[:number_of_pixels]:
             print(pixel)
         print(f"{len(matching_pixels)} pixels found. Average mood : {round(calculate_average(matching_pixels),2)}")
+        print_relative_mood(pixels, matching_pixels)
     else:
         print("No pixel found")
 
 
+@profiling.timed()
 def search_pixel_by_tag(pixels, search_tag, number_of_pixels):
     formated_tag = format_text(search_tag)
-    matching_pixels = []
-    for pixel in pixels:
-        if formated_tag in format_text(pixel.tags):
-            matching_pixels.append(pixel)
+    matching_pixels = get_search_index(pixels).search_tags(formated_tag)
     if len(matching_pixels) > 0:
         for pixel in matching_pixels[:number_of_pixels]:
             print(pixel)
         print(f"{len(matching_pixels)} pixels found. Average mood : {round(calculate_average(matching_pixels),2)}")
+        print_relative_mood(pixels, matching_pixels)
     else:
         print("No pixel found")
 
 
+@profiling.timed()
 def search_pixel_by_notes(pixels, search_notes, number_of_pixels):
     formated_notes = format_text(search_notes)
-    matching_pixels = []
-    for pixel in pixels:
-        if formated_notes in format_text(pixel.notes):
-            matching_pixels.append(pixel)
+    matching_pixels = get_search_index(pixels).search_notes(formated_notes)
     if len(matching_pixels) > 0:
         for pixel in matching_pixels[:number_of_pixels]:
             print(pixel)
         print(f"{len(matching_pixels)} pixels found. Average mood : {round(calculate_average(matching_pixels),2)}")
+        print_relative_mood(pixels, matching_pixels)
     else:
         print("No pixel found")
 
@@ -462,8 +752,6 @@ def write_pixel(pixels, pixel_file):
             choice = input("y/n: ")
             if choice.lower() in ["y", "o", "yes", "oui", "1"]:
                 print("Pixel will be overwritten")
-                # remove the pixel from the list
-                pixels = [pixel for pixel in pixels if pixel.date != date]
             else:
                 ready_to_write = False
 
@@ -485,22 +773,38 @@ def write_pixel(pixels, pixel_file):
     tags = []
     tag = "."
     while tag != "":
-        tag = input(f"{UNDERLINE}Tags{RESET} (empty line to stop): ")
+        tag = input(f"{UNDERLINE}Tags{RESET} (empty line to stop, tagCategory,tagName): ")
         if tag != "":
-            if tag.split(',') == 2:
-                tagCategory, tagName = tag.split(',')
-                tags.append((tagCategory, tagName))
-            else:
-                tags.append(("Emotions", tagName))
+            tags.append(parse_tag(tag))
 
-    new_pixel = Pixel(pixel={"date": date, "type": "Mood", "scores": scores, "notes": notes.strip(), "tags": tags})
-    pixels.append(new_pixel)
+    new_pixel = create_pixel(date, scores, notes, tags)
+    pixels.add(new_pixel)  # overwrites in place the pixel of the same date
     print(new_pixel)
 
-    write_to_json(pixels, pixel_file)  # Write the updated pixels list to the JSON file
+    save_changes(pixels, pixel_file, [pixel_record(new_pixel)])
+
+
+def create_pixel(date, scores, notes="", tags=()):
+    # tags are (tagCategory, tagName) pairs
+    return Pixel(pixel={"date": date, "type": "Mood", "scores": scores, "notes": notes.strip(), "tags": PixelEncoder.encode_tags(tags)})
+
+
+def pixel_record(pixel):
+    # journal record of a written pixel
+    return {"op": "pixel", "pixel": PixelEncoder().default(pixel)}
+
+
 
+def read_tags_to_add(tags_file="tags_to_add.txt"):
+    all_tags_raw = [tag.strip() for tag in open(tags_file, "r", encoding="utf-8") if tag.strip() != ""]
+    all_tags = []
+    for tag in all_tags_raw:
+        tagCategory, tagName = tag.split(",")
+        all_tags.append((tagCategory.strip(), tagName.strip()))
+    return all_tags
 
 
+@profiling.timed()
 def add_tag_to_pixels(pixels, pixel_file):
     
     open("tags_to_add.txt", "a", encoding='utf-8').close() # Create the file if it doens't exist
@@ -509,35 +813,141 @@ def add_tag_to_pixels(pixels, pixel_file):
     print("The tagCategory must exists in your app!")
     input("Enter to continue...")
 
-    all_tags_raw = [tag.strip() for tag in open("tags_to_add.txt", "r", encoding="utf-8") if tag.strip() != ""]
-    all_tags = []
-    for tag in all_tags_raw:
-        tagCategory, tagName = tag.split(",")
-        all_tags.append((tagCategory.strip(), tagName.strip()))
+    all_tags = read_tags_to_add()
+    dry_run = input("Dry run, only count the matches? (y/n): ").lower() in ["y", "o", "yes", "oui", "1"]
+    auto_tag_pixels(pixels, pixel_file, all_tags, dry_run)
 
-    for i, pixel in enumerate(pixels):
-        formated_note = format_text(pixel.notes)
-        for tag in all_tags:
-            if tag not in pixel.tags:
-                formated_tag = format_text(tag[1])
-                pattern = re.compile(fr'\b{re.escape(formated_tag)}\b')
-                if re.search(pattern, formated_note):
-                    pixels[i].tags.append(tag)
-                    formated_note = re.sub(pattern, '', formated_note)
-                
-    write_to_json(pixels, pixel_file)  # Write the updated pixels list to the JSON file
+
+@profiling.timed()
+def auto_tag_pixels(pixels, pixel_file, all_tags, dry_run=False):
+    # Adds the tags (tagCategory, tagName) to the pixels whose notes contain the tagName
+
+    start_time = time.perf_counter()
+    pixels_list = list(pixels)
+    rules = [(tag, format_text(tag[1])) for tag in all_tags]
+    added_tags, matches = tag_pixels(rules, [format_text(pixel.notes) for pixel in pixels_list], [set(pixel.tags) for pixel in pixels_list])
+    elapsed_time = time.perf_counter() - start_time
+
+    print(f"\n{UNDERLINE}Matches per tag{RESET}")
+    for (tagCategory, tagName), count in zip(all_tags, matches):
+        print(f"{tagCategory},{tagName} : {count}")
+    print(f"{len(pixels_list)} pixels tagged in {elapsed_time:.2f}s ({len(pixels_list) / max(elapsed_time, 1e-9):.0f} pixels/s)")
+
+    if dry_run:
+        return
+
+    records = []
+    for pixel, pixel_added_tags in zip(pixels_list, added_tags):
+        if pixel_added_tags:
+            pixel.add_tags(pixel_added_tags)
+            records.append({"op": "tags", "date": pixel.date, "tags": pixel_added_tags})
+            pixels.touch(pixel)
+
+    if records:
+        save_changes(pixels, pixel_file, records)
 
 
 
 class Pixel:
+    """
+    One day. Compact: the date is kept as a day ordinal, the scores as bytes and the tags as
+    (category, name) pairs shared by all the pixels (see tag_registry).
+    """
+
+    __slots__ = ("ordinal", "scores", "_pixel_type", "_notes", "_tags")
 
     def __init__(self, pixel: dict = None):
         self.date = pixel["date"]
-        self.pixel_type = pixel["type"]
-        self.scores = pixel["scores"]
-        self.notes = pixel["notes"]
-        self.tags = self.get_tags(pixel["tags"])
-        self.raw_tags = pixel["tags"]
+        self.scores = array('b', map(int, pixel["scores"]))
+        self._set_fields(pixel)
+
+
+    @classmethod
+    def from_fields(cls, ordinal, pixel_type, scores, notes, tags):
+        # Pixel from the values returned by fields(), without decoding anything
+        pixel = cls.__new__(cls)
+        pixel.ordinal = ordinal
+        pixel.scores = scores
+        pixel._pixel_type = sys.intern(pixel_type)
+        pixel._notes = notes
+        pixel._tags = tuple(TAGS.intern(categoryName, entry) for categoryName, entry in tags)
+        return pixel
+
+
+    def fields(self):
+        return (self.ordinal, self.pixel_type, self.scores, self.notes, self.tags)
+
+
+    def backup_dict(self) -> dict:
+        # the pixel as written in the backup
+        return {
+            "date": self.date,
+            "type": self._pixel_type,
+            "scores": self.scores.tolist(),
+            "notes": self._notes,
+            "tags": encoded_tags(self._tags),
+        }
+
+
+    def _set_fields(self, pixel: dict):
+        self._pixel_type = sys.intern(pixel["type"])
+        self._notes = pixel["notes"]
+        self._tags = tuple(self.get_tags(pixel["tags"]))
+
+
+    @property
+    def date(self):
+        day = date.fromordinal(self.ordinal)
+        return f"{day.year}-{day.month}-{day.day}"
+
+    @date.setter
+    def date(self, value):
+        self.ordinal = date_to_ordinal(value)
+
+    @property
+    def pixel_type(self):
+        return self._pixel_type
+
+    @pixel_type.setter
+    def pixel_type(self, value):
+        self._pixel_type = sys.intern(value)
+
+    @property
+    def notes(self):
+        return self._notes
+
+    @notes.setter
+    def notes(self, value):
+        self._notes = value
+
+    @property
+    def tags(self):
+        # a new list each time: use add_tags to modify the tags
+        return list(self._tags)
+
+    @tags.setter
+    def tags(self, value):
+        self._tags = tuple(TAGS.intern(categoryName, entry) for categoryName, entry in value)
+
+    @property
+    def raw_tags(self):
+        # the tags as they are written in the backup
+        return PixelEncoder.encode_tags(self.tags)
+
+
+    def has_tag(self, tag: tuple) -> bool:
+        return tuple(tag) in self._tags
+
+
+    def add_tags(self, tags: list):
+        # Adds the tags the pixel doesn't have yet, returns the added ones
+        added_tags = []
+        for categoryName, entry in tags:
+            tag = TAGS.intern(categoryName, entry)
+            if tag not in self._tags and tag not in added_tags:
+                added_tags.append(tag)
+        self._tags += tuple(added_tags)
+        return added_tags
 
 
     def get_tags(self, tags_raw: list):
@@ -545,7 +955,7 @@ class Pixel:
         for category in tags_raw:
             categoryName = category["type"]
             for entry in category["entries"]:
-                tags.append((categoryName, entry))
+                tags.append(TAGS.intern(categoryName, entry))
         return tags
             
 
@@ -569,23 +979,16 @@ class Pixel:
         return self.__str__()
 
     def __eq__(self, other):
-        if isinstance(other, str):
+        if not isinstance(other, Pixel):
             return False
-        return self.__dict__ == other.__dict__
+        return self.fields() == other.fields()
 
     
 
 class PixelEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Pixel):
-            encoded_pixel = {
-                "date": obj.date,
-                "type": obj.pixel_type,
-                "scores": list(map(int, obj.scores)),
-                "notes": obj.notes,
-                "tags": self.encode_tags(obj.tags),
-            }
-            return encoded_pixel
+            return obj.backup_dict()
         return super().default(obj)
     
     @staticmethod
@@ -608,6 +1011,12 @@ class PixelEncoder(json.JSONEncoder):
 
         return encoded_tags
 
+
+@lru_cache(maxsize=1 << 16)
+def encoded_tags(tags: tuple) -> list:
+    # PixelEncoder.encode_tags shared by the pixels with the same tags (not to be modified)
+    return PixelEncoder.encode_tags(tags)
+
     
 
 
@@ -615,9 +1024,335 @@ class PixelEncoder(json.JSONEncoder):
 
 
 
+######################
+#      Database      #
+######################
+
+def search_database(database, search_by, search_value, number_of_pixels):
+    if search_by == "date":
+        raw_pixel = database.get(search_value)
+        print(Pixel(pixel=raw_pixel) if raw_pixel is not None else "No pixel found")
+        return
+    search_func = {"notes": database.search_notes, "mood": database.search_mood, "tag": database.search_tag}[search_by]
+    raw_pixels, count, average_mood = search_func(search_value, number_of_pixels)
+    if count > 0:
+        for raw_pixel in raw_pixels:
+            print(Pixel(pixel=raw_pixel))
+        print(f"{count} pixels found. Average mood : {round(average_mood,2)}")
+    else:
+        print("No pixel found")
+
+
+def display_database_statistics(database, number_of_words, formats=REPORT_FORMATS, terminal=True):
+    # The main statistics of display_statistics, computed by the database
+
+    if not os.path.exists("statistics"):
+        os.makedirs("statistics")
+    TIME_KEY = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    file_paths = report_paths(f"statistics/{TIME_KEY}", formats)
+
+    try:
+        number_of_words = max(1, int(number_of_words))
+    except ValueError:
+        number_of_words = 5
+
+    number_of_pixels = len(database)
+    if number_of_pixels == 0:
+        print("No pixel found")
+        return
+
+    outputs = [OUTPUTS[report_format](file_path) for report_format, file_path in zip(formats, file_paths)]
+    if terminal:
+        outputs.insert(0, TerminalOutput())
+    report = Report(outputs)
+
+    report.section("General statistics")
+    longest_streak, last_streak = runs_streaks(database.runs())
+    totals_days = database.total_days()
+    days_missed = totals_days - number_of_pixels
+    first_pixel = datetime_to_string(database.first_day())
+    report.line(f"Number of pixels: {number_of_pixels}", label="Number of pixels", value=number_of_pixels)
+    report.line(f"First pixel: {first_pixel}", label="First pixel", value=first_pixel)
+    report.line(f"Longest streak: {longest_streak}", label="Longest streak", value=longest_streak)
+    report.line(f"Current streak: {last_streak}", label="Current streak", value=last_streak)
+    report.line(f"Number of pixels missed since the first pixel: {days_missed} ({days_missed/totals_days*100:.2f}%)",
+                label="Pixels missed", value=days_missed, percent=round(days_missed/totals_days*100, 2))
+
+    report.section("Mood statistics")
+    mood_counts = database.mood_counts()
+    for mood in range(5, 0, -1):
+        mood_percentage = round(100 * mood_counts.get(mood, 0) / number_of_pixels, 2)
+        report.line(f" {mood}: {mood_counts.get(mood, 0)} ({mood_percentage}%)", get_color_of_mood([mood]),
+                    label=mood, value=mood_counts.get(mood, 0), percent=mood_percentage)
+    avg_mood = round(database.average_mood(), 2)
+    report.line(f"Average mood ({number_of_pixels} days): {avg_mood}", label="Average mood", value=avg_mood)
+    for last_days in STATS_DAYS:
+        avg_mood = round(database.average_mood(last_days), 2)
+        report.line(f"Average mood of the last {last_days} days: {avg_mood}",
+                    label=f"Average mood of the last {last_days} days", value=avg_mood)
+
+    report.section("Notes statistics")
+    excluded_words = read_excluded_words()
+    for title, last_days in [("of all time", None), ("of the last 7 days", 7), ("of the last 30 days", 30)]:
+        report.subsection(f"Top {number_of_words} words {title}:")
+        decimals = 2 if last_days is None else 1
+        window_pixels = database.count_pixels(last_days)
+        for word, count in database.top_words(number_of_words, excluded_words, last_days):
+            percent = round(100 * count / window_pixels, decimals)
+            report.line(f" - {word.capitalize()} : {count} ({percent:.{decimals}f}%)", label=word, value=count, percent=percent)
+
+    report.section("Tags statistics")
+    for title, last_days in [("", None), (" of the last 7 days", 7), (" of the last 30 days", 30)]:
+        report.subsection(f"Top 5 tags{title}:")
+        window_pixels = database.count_pixels(last_days)
+        for tag, count in database.top_tags(5, last_days):
+            percent = round(100 * count / window_pixels, 1)
+            report.line(f" - {tag.capitalize()} : {count} ({percent:.1f}%)", label=tag, value=count, percent=percent)
+
+    report.close()
+    if file_paths:
+        saved_files = ", ".join(f"'{file_path}'" for file_path in file_paths)
+        print(f"\n\nStatistics saved in {saved_files}")
+
+
+def export_database(database, pixel_file):
+    # Backup in the Pixels app format, written pixel by pixel
+    pixels = (Pixel(pixel=raw_pixel).backup_dict() for raw_pixel in database.iter_pixels())
+    journal.write_atomic(pixel_file, lambda file: dump_backup(file, pixels, BACKUP_FORMAT))
+
+
+def run_database_command(args, database, pixel_file):
+    if args.db_command == "import":
+        start_time = time.perf_counter()
+        number_of_pixels = database.import_backup(pixel_file)
+        print(f"{number_of_pixels} pixels imported in '{database_path(pixel_file)}' in {time.perf_counter() - start_time:.2f}s")
+    elif args.db_command == "write":
+        if args.keep and database.get(args.date) is not None:
+            print(f"A pixel already exists on {args.date}")
+            return
+        new_pixel = create_pixel(args.date, args.scores, args.notes, args.tags)
+        database.add(PixelEncoder().default(new_pixel))
+        print(new_pixel)
+    elif args.db_command == "search":
+        search_database(database, args.by, args.value, args.number)
+    elif args.db_command == "stats":
+        display_database_statistics(database, args.words, args.formats, terminal=not args.quiet)
+    elif args.db_command == "export":
+        export_database(database, args.output)
+        print(f"{len(database)} pixels written in '{args.output}'")
+
+
+
+#####################
+#        CLI        #
+#####################
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Write, search and display your pixels.",
+                                     epilog="Without a command, the interactive menu is started.")
+    parser.add_argument("-f", "--file", help="backup to use (the JSON file of the current directory by default)")
+    parser.add_argument("--backup-format", choices=list(SERIALIZERS), help=f"format of the backups written ({BACKUP_FORMAT} by default)")
+    parser.add_argument("--profile", nargs="?", const="", metavar="OUTPUT",
+                        help=f"time the operations and print a summary at exit, saved in OUTPUT (.json or .prof, in {profiling.PROFILE_FOLDER}/ without a folder) if given (or set {profiling.PROFILE_ENV})")
+    commands = parser.add_subparsers(dest="command")
+
+    commands.add_parser("load", help="load the backup (and build its cache)")
+
+    # arguments shared with the database commands
+    write_arguments = argparse.ArgumentParser(add_help=False)
+    write_arguments.add_argument("scores", nargs="+", choices=["1", "2", "3", "4", "5"], help="mood, and the moods of the sub-pixels")
+    write_arguments.add_argument("-d", "--date", default=datetime_to_string(datetime.now()), type=parse_date, help="YYYY-MM-DD, today by default")
+    write_arguments.add_argument("--notes", default="")
+    write_arguments.add_argument("-t", "--tag", dest="tags", action="append", default=[], type=parse_tag, help="tagCategory,tagName (repeatable)")
+    write_arguments.add_argument("--keep", action="store_true", help="don't overwrite the pixel of the date")
+    search_arguments = argparse.ArgumentParser(add_help=False)
+    search_arguments.add_argument("by", choices=["date", "notes", "mood", "tag"])
+    search_arguments.add_argument("value", action=SearchValue)
+    search_arguments.add_argument("-n", "--number", type=int, default=10, help="number of pixels to display")
+    stats_arguments = argparse.ArgumentParser(add_help=False)
+    stats_arguments.add_argument("-n", "--words", default=5, help="number of words to display")
+    stats_arguments.add_argument("--formats", nargs="*", choices=list(OUTPUTS), default=REPORT_FORMATS, help="files to save")
+    stats_arguments.add_argument("-q", "--quiet", action="store_true", help="only save the files")
+
+    commands.add_parser("write", parents=[write_arguments], help="write a pixel")
+    commands.add_parser("search", parents=[search_arguments], help="search pixels")
+    commands.add_parser("stats", parents=[stats_arguments], help="display and save the statistics")
+
+    display = commands.add_parser("display", help="display the pixels")
+    display.add_argument("view", choices=["grid", "calendar", "year", "days"])
+    display.add_argument("value", nargs="?", default="", help="month (YYYY-MM) of the calendar, year (YYYY) of the year view")
+    display.add_argument("-n", "--number", default="", help="number of pixels (grid), months (calendar) or days (days)")
+
+    add_tags = commands.add_parser("add-tags", help="tag the pixels whose notes contain the tags names")
+    add_tags.add_argument("--tags-file", default="tags_to_add.txt", help="one tagCategory,tagName per line")
+    add_tags.add_argument("--dry-run", action="store_true", help="only count the matches")
+
+    backups = commands.add_parser("backups", help="statistics of every backup of a directory, and of all of them")
+    backups.add_argument("directory", nargs="?", default=".")
+    backups.add_argument("-n", "--words", type=int, default=5, help="number of words to display")
+    backups.add_argument("-w", "--workers", type=parse_workers, help="number of processes (one per CPU by default)")
+    backups.add_argument("--formats", nargs="*", choices=list(OUTPUTS), default=REPORT_FORMATS, help="files to save")
+    backups.add_argument("-q", "--quiet", action="store_true", help="only save the files")
+
+    merge = commands.add_parser("merge", help="merge backups into one backup")
+    merge.add_argument("output", help="backup to write")
+    merge.add_argument("inputs", nargs="+", help="backups to merge, from the oldest to the newest")
+    merge.add_argument("-p", "--policy", choices=POLICIES, default="newest",
+                       help="for the days in several backups: pixel of the newest backup, with the tags of all (union), and the notes of all (concat)")
+
+    database = commands.add_parser("db", help="use a SQLite copy of the backup, saved next to it")
+    database_commands = database.add_subparsers(dest="db_command", required=True)
+    database_commands.add_parser("import", help="copy the backup in the database (replacing its content)")
+    database_commands.add_parser("write", parents=[write_arguments], help="write a pixel in the database")
+    database_commands.add_parser("search", parents=[search_arguments], help="search pixels in the database")
+    database_commands.add_parser("stats", parents=[stats_arguments], help="statistics of the database")
+    export = database_commands.add_parser("export", help="write the pixels of the database as a backup")
+    export.add_argument("output", help="backup to write")
+
+    batch = commands.add_parser("batch", help="run the commands of a file, the backup being loaded once")
+    batch.add_argument("input", nargs="?", default="-", help="one command per line, or one pixel per line as JSON (stdin by default)")
+    return parser
+
+
+def run_command(args, pixels, pixel_file, quiet=False):
+    # Runs a parsed command, returns the records of the pixels written (saved by the caller)
+    if args.command == "write":
+        if args.keep and not get_aviability(pixels, args.date):
+            print(f"A pixel already exists on {args.date}")
+            return []
+        new_pixel = create_pixel(args.date, args.scores, args.notes, args.tags)
+        pixels.add(new_pixel)
+        if not quiet:
+            print(new_pixel)
+        return [pixel_record(new_pixel)]
+
+    if args.command == "search":
+        if args.by == "date":
+            print(search_pixel_by_date(pixels, args.value))
+        else:
+            search_func = {"notes": search_pixel_by_notes, "mood": search_pixel_by_mood, "tag": search_pixel_by_tag}[args.by]
+            search_func(pixels, args.value, args.number)
+    elif args.command == "stats":
+        display_statistics(pixels, args.words, args.formats, terminal=not args.quiet, pixel_file=pixel_file)
+    elif args.command == "display":
+        if args.view == "calendar":
+            display_pixels_month(pixels, args.value, args.number or 1)
+        elif args.view == "year":
+            display_pixels_of_year(pixels, args.value)
+        elif args.view == "days":
+            display_pixels_days(pixels, args.number)
+        else:
+            display_pixels_year(pixels, args.number)
+    elif args.command == "add-tags":
+        auto_tag_pixels(pixels, pixel_file, read_tags_to_add(args.tags_file), args.dry_run)
+    return []
+
+
+def run_batch(pixels, pixel_file, batch_file):
+    # The pixels written are saved once, at the end (or before a command saving the backup itself)
+    parser = build_parser()
+    records = []
+    number_of_commands = 0
+    file = sys.stdin if batch_file == "-" else open(batch_file, "r", encoding='utf-8')
+    try:
+        with file:
+            for line_number, line in enumerate(file, 1):
+                line = line.strip()
+                if line == "" or line.startswith("#"):
+                    continue
+                if line.startswith("{"):
+                    try:
+                        new_pixel = Pixel(pixel=json.loads(line))
+                    except (ValueError, KeyError, TypeError) as error:
+                        print(f"Line {line_number} ignored: invalid pixel ({error})", file=sys.stderr)
+                        continue
+                    pixels.add(new_pixel)
+                    records.append(pixel_record(new_pixel))
+                    number_of_commands += 1
+                    continue
+
+                try:
+                    args = parser.parse_args(shlex.split(line))
+                except (SystemExit, ValueError):  # argparse already printed why
+                    print(f"Line {line_number} ignored", file=sys.stderr)
+                    continue
+                if args.command in [None, "batch", "load", "backups", "merge", "db"]:
+                    print(f"Line {line_number} ignored: not a batch command", file=sys.stderr)
+                    continue
+                if args.command == "add-tags" and records:
+                    save_changes(pixels, pixel_file, records)
+                    records = []
+                try:
+                    records += run_command(args, pixels, pixel_file, quiet=True)
+                except (ValueError, KeyError) as error:
+                    print(f"Line {line_number} failed: {error}", file=sys.stderr)
+                    continue
+                number_of_commands += 1
+    finally:
+        # the pixels written before an error are saved too
+        if records:
+            save_changes(pixels, pixel_file, records)
+    print(f"{number_of_commands} commands run")
+
+
+def run_cli(args):
+    if args.command == "backups":
+        display_backups_statistics(args.directory, args.words, args.workers, args.formats, terminal=not args.quiet)
+        return 0
+    if args.command == "merge":
+        try:
+            number_of_pixels, conflicts = merge_backups(args.inputs, args.output, args.policy, BACKUP_FORMAT)
+        except (OSError, ValueError) as error:
+            print(error, file=sys.stderr)
+            return 1
+        print(f"{number_of_pixels} pixels written in '{args.output}' ({conflicts} days in several backups)")
+        return 0
+
+    pixel_file = args.file or find_pixel_file(interactive=False)
+    if pixel_file is None:
+        print("No backup to use: put one JSON file in the directory, or use --file", file=sys.stderr)
+        return 1
+
+    if args.command == "db":
+        with PixelDatabase(database_path(pixel_file)) as database:
+            run_database_command(args, database, pixel_file)
+        return 0
+
+    start_time = time.perf_counter()
+    pixel_file, pixels = load_pixels(pixel_file)
+    if args.command == "load":
+        print(f"{len(pixels)} pixels loaded from '{pixel_file}' in {time.perf_counter() - start_time:.2f}s")
+    elif args.command == "batch":
+        run_batch(pixels, pixel_file, args.input)
+    else:
+        records = run_command(args, pixels, pixel_file)
+        if records:
+            save_changes(pixels, pixel_file, records)
+    return 0
+
+
+
 if __name__ == "__main__":
 
-    pixel_file, pixels = load_pixels()
+    args = build_parser().parse_args()
+    if args.backup_format is not None:
+        BACKUP_FORMAT = args.backup_format
+    if args.profile is not None:
+        profiling.enable(args.profile or None)
+    else:
+        profiling.enable_from_environment()
+    if args.command is not None:
+        sys.exit(run_cli(args))
+
+    if BACKGROUND_LOADING:
+        pixel_file = args.file or find_pixel_file()
+        # the indexes are built from a copy of the pixels, without saving the cache: the menu never waits for them
+        pixels = FutureStore(lambda: load_pixels(pixel_file)[1], [
+            lambda pixels: build_index(pixels, "search", lambda copy: build_search_index(copy).prepare()),
+            lambda pixels: build_index(pixels, "stats", lambda copy: StatsAccumulator.build(copy, read_excluded_words())),
+        ], waiting_message="Loading the pixels...")
+    else:
+        pixel_file, pixels = load_pixels(args.file)
 
     ##########################
     #          MENU          #
@@ -633,6 +1368,8 @@ if __name__ == "__main__":
         print("3. Display pixels")
         print("4. Statistics")
         print("5. Add tags")
+        if JOURNAL_MODE:
+            print("6. Save journal to the backup")
         print("9. About/infos")
         print("other. exit")
         choice_menu = input("Choice: ")
@@ -680,21 +1417,35 @@ if __name__ == "__main__":
                 search_func(pixels, search_value.strip(), number_of_pixels)
 
         elif choice_menu == "3":
-            """
             print("1. Grid display")
-            # print("2. Calendar display") # Not yet implemented
+            print("2. Calendar display")
+            print("3. Year display")
+            print("4. Last days display")
             choice_display = input("Choice: ")
-            """
-            number_to_display = input("Number of pixels to display: ")
-            display_pixels_year(pixels, number_to_display)
+            if choice_display == "2":
+                month = input("Month to display (YYYY-MM, last month by default): ")
+                number_to_display = input("Number of months to display: ")
+                display_pixels_month(pixels, month, number_to_display)
+            elif choice_display == "3":
+                year = input("Year to display (YYYY): ")
+                display_pixels_of_year(pixels, year)
+            elif choice_display == "4":
+                number_to_display = input("Number of days to display: ")
+                display_pixels_days(pixels, number_to_display)
+            else:
+                number_to_display = input("Number of pixels to display: ")
+                display_pixels_year(pixels, number_to_display)
 
         elif choice_menu == "4":
             number_to_display = input("Number of words to display (notes): ")
-            display_statistics(pixels, number_to_display)
+            display_statistics(pixels, number_to_display, pixel_file=pixel_file)
             
         elif choice_menu == "5":
             add_tag_to_pixels(pixels, pixel_file)
 
+        elif choice_menu == "6" and JOURNAL_MODE:
+            compact_journal(pixels, pixel_file)
+
         elif choice_menu == "9":
             print("YearInPixels PC")
             print("Version 1.3.1")
@@ -710,5 +1461,6 @@ if __name__ == "__main__":
 
 
         else:
+            compact_journal(pixels, pixel_file)
             print("Have a nice day !")
             exit()
\ No newline at end of file
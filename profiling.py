@@ -0,0 +1,155 @@
+import atexit
+import cProfile
+from functools import wraps
+import json
+import os
+import sys
+import time
+
+
+
+# "1" to time the operations of a session, or a file to save the results in: .json (timers and counters)
+# or .prof (cProfile dump, for pstats or snakeviz). A summary is printed at exit in both cases.
+PROFILE_ENV = "PIXELS_PROFILE"
+# folder of the files given without a folder: a .json next to the backup would be taken for a second backup
+PROFILE_FOLDER = "profiles"
+
+_enabled = False
+_output = None
+_profiler = None
+timers = {}  # name -> [calls, seconds]
+counters = {}  # name -> value
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(output=None):
+    global _enabled, _output, _profiler
+    if _enabled:
+        return
+    _enabled = True
+    if output is not None and not os.path.dirname(output):
+        output = os.path.join(PROFILE_FOLDER, output)
+    _output = output
+    if output is not None:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    if output is not None and output.endswith(".prof"):
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(_at_exit)
+
+
+def enable_from_environment():
+    value = os.environ.get(PROFILE_ENV, "")
+    if value not in ("", "0"):
+        enable(None if value == "1" else value)
+
+
+def _record(name: str, seconds: float):
+    timer = timers.get(name)
+    if timer is None:
+        timer = timers[name] = [0, 0.0]
+    timer[0] += 1
+    timer[1] += seconds
+
+
+def count(name: str, value=1):
+    if _enabled:
+        counters[name] = counters.get(name, 0) + value
+
+
+def timed(name=None):
+    # Decorator timing each call of a function. Disabled, it costs one test per call.
+    def decorator(function):
+        label = name or function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _record(label, time.perf_counter() - start_time)
+        return wrapper
+    return decorator
+
+
+
+class Laps:
+    """
+    Timers of the successive parts of a function: lap(name) stops the current part and starts the next one.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.name = None
+        self.start_time = None
+
+
+    def lap(self, name: str):
+        now = time.perf_counter()
+        if self.name is not None:
+            _record(f"{self.prefix}/{self.name}", now - self.start_time)
+        self.name = name
+        self.start_time = now
+
+
+    def stop(self):
+        if self.name is not None:
+            _record(f"{self.prefix}/{self.name}", time.perf_counter() - self.start_time)
+            self.name = None
+
+
+
+class _NoLaps:
+
+    def lap(self, name: str):
+        pass
+
+    def stop(self):
+        pass
+
+
+_NO_LAPS = _NoLaps()
+
+
+def laps(prefix: str):
+    return Laps(prefix) if _enabled else _NO_LAPS
+
+
+
+def results() -> dict:
+    return {
+        "timers": {name: {"calls": calls, "seconds": round(seconds, 6)} for name, (calls, seconds) in timers.items()},
+        "counters": dict(counters),
+    }
+
+
+def summary() -> str:
+    # table of the timers, slowest first, then the counters
+    width = max([len(name) for name in list(timers) + list(counters)] + [20])
+    lines = [f"{'Operation':<{width}}  {'calls':>7}  {'total (s)':>10}  {'mean (ms)':>10}"]
+    for name, (calls, seconds) in sorted(timers.items(), key=lambda item: item[1][1], reverse=True):
+        lines.append(f"{name:<{width}}  {calls:>7}  {seconds:>10.3f}  {1000 * seconds / calls:>10.2f}")
+    if counters:
+        lines.append("")
+        lines.append(f"{'Counter':<{width}}  {'value':>7}")
+        for name, value in counters.items():
+            lines.append(f"{name:<{width}}  {value:>7}")
+    return "\n".join(lines)
+
+
+def _at_exit():
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_output)
+    elif _output is not None:
+        with open(_output, "w", encoding='utf-8') as file:
+            json.dump(results(), file, indent=4)
+    print("\n" + summary(), file=sys.stderr)
+    if _output is not None:
+        print(f"Profile saved in '{_output}'", file=sys.stderr)
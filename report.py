@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+import os
+import sys
+
+from styles import RESET, UNDERLINE
+
+
+
+class Report:
+    """
+    Lines of a report grouped by sections, kept in memory and written once to every output when closed.
+    Lines can carry values (label, value, percent) for the machine-readable outputs.
+    """
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.sections = []  # [title, [(group, text, style, values)]]
+        self.group = None
+
+
+    def section(self, title: str):
+        self.sections.append((title, []))
+        self.group = None
+
+
+    def subsection(self, title: str):
+        # a line introducing the next lines (e.g. "Top 5 words of the last 7 days:")
+        self.group = title.rstrip(":")
+        self.line(title)
+
+
+    def line(self, text: str, style="", **values):
+        if not self.sections:
+            self.section("")
+        self.sections[-1][1].append((self.group, text, style, values))
+
+
+    def close(self):
+        for output in self.outputs:
+            output.write(self.sections)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+
+
+class TerminalOutput:
+    # ANSI styled text, written to the terminal in one call
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, sections):
+        text = io.StringIO()
+        for title, lines in sections:
+            if title:
+                text.write(f"{UNDERLINE}\n{title}:{RESET}\n")
+            for _, line, style, _ in lines:
+                text.write(f"{style}{line}{RESET}\n")
+        (self.stream or sys.stdout).write(text.getvalue())
+
+
+
+class TextOutput:
+    # Plain text file, the statistics/<date>.txt format
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, sections):
+        with open(self.path, "w", encoding='utf-8') as file:
+            for title, lines in sections:
+                if title:
+                    file.write(f"\n____________________\n{title}:\n")
+                file.writelines(f"{line}\n" for _, line, _, _ in lines)
+
+
+
+class JsonOutput:
+    # {"sections": [{"title": ..., "values": [{"group": ..., "label": ..., "value": ..., "percent": ...}]}]}
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, sections):
+        report = {"sections": [
+            {"title": title, "values": [dict(group=group, **values) for group, _, _, values in lines if values]}
+            for title, lines in sections
+        ]}
+        with open(self.path, "w", encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=4)
+
+
+
+class CsvOutput:
+    # One row per value: section, group, label, value, percent
+
+    COLUMNS = ["section", "group", "label", "value", "percent"]
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, sections):
+        with open(self.path, "w", encoding='utf-8', newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=self.COLUMNS)
+            writer.writeheader()
+            for title, lines in sections:
+                for group, _, _, values in lines:
+                    if values:
+                        writer.writerow(dict(section=title, group=group, **values))
+
+
+
+OUTPUTS = {
+    "txt": TextOutput,
+    "json": JsonOutput,
+    "csv": CsvOutput,
+}
+
+
+
+def report_paths(name: str, formats) -> list:
+    # <name>.<format> paths, numbered (<name>_2.<format>...) when a report of the same second already has one
+    paths = [f"{name}.{report_format}" for report_format in formats]
+    number = 1
+    while any(os.path.exists(path) for path in paths):
+        number += 1
+        paths = [f"{name}_{number}.{report_format}" for report_format in formats]
+    return paths
@@ -0,0 +1,101 @@
+from bisect import bisect_right
+from itertools import accumulate
+
+
+
+# joins the texts: a match of a query without it can't span two texts
+SEPARATOR = "\x00"
+
+
+
+class TextIndex:
+    """
+    Substring index over normalized texts: the texts are joined with SEPARATOR, so a search is a few str.find
+    over the joined text (a scan in C) instead of a Python loop over the texts. Building it costs one join,
+    redone on the next search after an update.
+    """
+
+    def __init__(self, texts=()):
+        self.texts = list(texts)  # id -> normalized text
+        self._joined = None  # the texts joined, None after an update
+        self._starts = None  # id -> position of the text in the joined text, then the end of the joined text
+
+
+    def add(self, text_id: int, text: str):
+        if text_id == len(self.texts):
+            self.texts.append(text)
+        else:
+            if self.texts[text_id] == text:
+                return
+            self.texts[text_id] = text
+        self._joined = None
+
+
+    def search(self, query: str) -> list:
+        # ids of the texts containing query, sorted
+        if query == "" or SEPARATOR in query:
+            return [text_id for text_id, text in enumerate(self.texts) if query in text]
+        if self._joined is None:
+            self._joined = SEPARATOR.join(self.texts)
+            self._starts = list(accumulate((len(text) + 1 for text in self.texts), initial=0))
+        joined, starts = self._joined, self._starts
+        found = []
+        position = joined.find(query)
+        while position != -1:
+            text_id = bisect_right(starts, position) - 1
+            found.append(text_id)
+            # a match can't cross a separator: the next one is in a following text
+            position = joined.find(query, starts[text_id + 1])
+        return found
+
+
+
+class SearchIndex:
+    """
+    Notes and tags of the pixels, each normalized on its first search (the cost of one search scanning the pixels),
+    then kept up to date and indexed for substring searches.
+    Results are in the order the pixels were first added (the order of the store).
+    """
+
+    def __init__(self, normalize_notes, normalize_tags):
+        self.normalize_notes = normalize_notes  # notes -> normalized text
+        self.normalize_tags = normalize_tags  # tuple of (category, name) -> normalized text
+        self.ids = {}  # day ordinal -> id
+        self.pixels = []  # id -> pixel
+        self.notes = None  # TextIndex, once searched
+        self.tags = None
+
+
+    def update(self, pixel):
+        ordinal = pixel.ordinal
+        pixel_id = self.ids.get(ordinal)
+        if pixel_id is None:
+            pixel_id = self.ids[ordinal] = len(self.pixels)
+            self.pixels.append(pixel)
+        else:
+            self.pixels[pixel_id] = pixel
+        if self.notes is not None:
+            self.notes.add(pixel_id, self.normalize_notes(pixel.notes))
+        if self.tags is not None:
+            self.tags.add(pixel_id, self.normalize_tags(tuple(pixel.tags)))
+
+
+    def prepare(self):
+        # normalizes the notes and the tags now rather than on the first search (to build it in the background)
+        if self.notes is None:
+            self.notes = TextIndex([self.normalize_notes(pixel.notes) for pixel in self.pixels])
+        if self.tags is None:
+            self.tags = TextIndex([self.normalize_tags(tuple(pixel.tags)) for pixel in self.pixels])
+        return self
+
+
+    def search_notes(self, formated_notes: str) -> list:
+        if self.notes is None:
+            self.notes = TextIndex([self.normalize_notes(pixel.notes) for pixel in self.pixels])
+        return [self.pixels[pixel_id] for pixel_id in self.notes.search(formated_notes)]
+
+
+    def search_tags(self, formated_tag: str) -> list:
+        if self.tags is None:
+            self.tags = TextIndex([self.normalize_tags(tuple(pixel.tags)) for pixel in self.pixels])
+        return [self.pixels[pixel_id] for pixel_id in self.tags.search(formated_tag)]
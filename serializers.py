@@ -0,0 +1,82 @@
+import json
+from json.encoder import encode_basestring
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the compact format is written with json instead
+    orjson = None
+
+
+
+# elements joined before each write
+CHUNK_ELEMENTS = 512
+
+
+def _pretty(value, indent: str) -> str:
+    # same text as json.dumps(value, ensure_ascii=False, indent=4) at this indentation, without the pure Python encoder
+    value_type = type(value)
+    if value_type is str:
+        return encode_basestring(value)
+    if value_type is int:
+        return int.__repr__(value)
+    if value_type is dict:
+        if not value:
+            return "{}"
+        inner = indent + "    "
+        items = ",\n".join(f"{inner}{encode_basestring(str(key))}: {_pretty(item, inner)}" for key, item in value.items())
+        return f"{{\n{items}\n{indent}}}"
+    if value_type is list or value_type is tuple:
+        if not value:
+            return "[]"
+        inner = indent + "    "
+        items = ",\n".join(inner + _pretty(item, inner) for item in value)
+        return f"[\n{items}\n{indent}]"
+    return json.dumps(value)  # floats, booleans and None
+
+
+def _write_list(file, texts, separator: str, closing: str):
+    # writes "[" + the texts joined by separator + closing, CHUNK_ELEMENTS texts at a time
+    file.write("[")
+    chunk = []
+    empty = True
+    for text in texts:
+        chunk.append(text if empty else separator + text)
+        empty = False
+        if len(chunk) == CHUNK_ELEMENTS:
+            file.write("".join(chunk))
+            chunk.clear()
+    file.write("".join(chunk))
+    file.write("]" if empty else closing)
+
+
+
+def dump_pretty(file, elements):
+    # The format of json.dump(list(elements), file, ensure_ascii=False, indent=4), like the backups written until now
+    _write_list(file, ("\n    " + _pretty(element, "    ") for element in elements), ",", "\n]")
+
+
+def dump_compact(file, elements):
+    # Without any whitespace: about half the size of the pretty format
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    _write_list(file, map(encode, elements), ",", "]")
+
+
+def dump_orjson(file, elements):
+    # Compact format, encoded by orjson when it's installed
+    if orjson is None:
+        return dump_compact(file, elements)
+    _write_list(file, (orjson.dumps(element).decode("utf-8") for element in elements), ",", "]")
+
+
+SERIALIZERS = {
+    "pretty": dump_pretty,
+    "compact": dump_compact,
+    "orjson": dump_orjson,
+}
+
+
+def dump_backup(file, elements, backup_format="pretty"):
+    # Writes the elements (dicts in the backup format) one by one, as a JSON list the Pixels app can import
+    if backup_format not in SERIALIZERS:
+        raise ValueError(f"Unknown backup format '{backup_format}', use one of {', '.join(SERIALIZERS)}")
+    SERIALIZERS[backup_format](file, elements)
@@ -0,0 +1,458 @@
+from array import array
+from bisect import bisect_left
+import calendar
+from collections import Counter
+from datetime import date
+from fractions import Fraction
+from itertools import accumulate, chain, groupby
+
+from notes_index import NotesIndex
+from tag_registry import TagIndex
+
+
+MOODS = (1, 2, 3, 4, 5)
+
+
+
+def runs_streaks(runs: list) -> tuple:
+    # (longest streak, current streak) from the lengths of the runs of consecutive days, the oldest first (see StatsAccumulator.streaks)
+    if len(runs) < 2:
+        return (runs[0], runs[0]) if runs else (0, 0)
+    return max(1, runs[-1], max(runs[:-1]) - 1), runs[0] - 1
+
+
+def _count(counter: Counter, keys, sign: int):
+    # adds (sign 1) or removes (sign -1) the keys, without leaving zeros behind
+    for key in keys:
+        count = counter[key] + sign
+        if count:
+            counter[key] = count
+        else:
+            del counter[key]
+
+
+
+class Window:
+    """
+    Aggregates of the pixels of the days first_day to last_day (day ordinals, both included), None for all of them.
+    """
+
+    def __init__(self, first_day=None, last_day=None):
+        self.first_day = first_day
+        self.last_day = last_day
+        self.number_of_pixels = 0
+        self.score_sums = {}  # number of scores of a pixel -> sum of the scores of these pixels
+        self.mood_counts = dict.fromkeys(MOODS, 0)
+        self.words = Counter()  # token id -> number of pixels using it
+
+
+    def count(self, scores: bytes, tokens, sign: int):
+        self.number_of_pixels += sign
+        self.score_sums[len(scores)] = self.score_sums.get(len(scores), 0) + sign * sum(scores)
+        for score in scores:
+            if score in self.mood_counts:
+                self.mood_counts[score] += sign
+        _count(self.words, tokens, sign)
+
+
+    def average_mood(self):
+        # average of the mean scores of the pixels, computed exactly (None without pixels)
+        if self.number_of_pixels == 0:
+            return None
+        total = sum(Fraction(scores_sum, number_of_scores) for number_of_scores, scores_sum in self.score_sums.items())
+        return float(total) / self.number_of_pixels
+
+
+
+def _running_totals(totals: array, start: int, values):
+    # totals[:start + 1] followed by the running totals of values
+    del totals[start + 1:]
+    totals.extend(accumulate(values, initial=totals[start]))
+    del totals[start + 1]
+
+
+
+class DaySums:
+    """
+    Prefix sums over the days: the number of pixels, of each mood, and the sum of the scores of the pixels by their
+    number of scores, before the day origin + i. The aggregates of any range of days then cost a few subtractions.
+    Recomputed lazily from the first day changed: adding the pixel of the last day only recomputes a few days.
+    """
+
+    def __init__(self):
+        self.origin = None
+        self.pixels = array('l', [0])
+        self.moods = {mood: array('l', [0]) for mood in MOODS}
+        self.score_sums = {}  # number of scores -> prefix sums
+        self.stale_from = 0  # index of the first day to recompute, None if up to date
+
+
+    def invalidate(self, ordinal: int):
+        if self.origin is None or ordinal < self.origin:
+            self.__init__()
+        else:
+            index = min(ordinal - self.origin, len(self.pixels) - 1)
+            self.stale_from = index if self.stale_from is None else min(self.stale_from, index)
+
+
+    def refresh(self, pixels: dict, first_day: int, last_day: int):
+        # pixels: day ordinal -> (scores, tags), first_day and last_day: the first and last days with a pixel
+        if self.origin is None:
+            self.origin = first_day
+        start = len(self.pixels) - 1 if self.stale_from is None else self.stale_from
+        if self.origin + start > last_day:
+            self.stale_from = None
+            return
+        day_scores = [pixels[ordinal][0] if ordinal in pixels else None for ordinal in range(self.origin + start, last_day + 1)]
+        _running_totals(self.pixels, start, [scores is not None for scores in day_scores])
+        day_scores = [scores or b"" for scores in day_scores]
+        for mood, totals in self.moods.items():
+            _running_totals(totals, start, [scores.count(mood) for scores in day_scores])
+        for number_of_scores in {len(scores) for scores in day_scores if scores}:
+            if number_of_scores not in self.score_sums:
+                self.score_sums[number_of_scores] = array('q', [0]) * (start + 1)
+        for number_of_scores, totals in self.score_sums.items():
+            _running_totals(totals, start, [sum(scores) if len(scores) == number_of_scores else 0 for scores in day_scores])
+        self.stale_from = None
+
+
+    def window(self, first_day: int, last_day: int) -> Window:
+        # aggregates of the days first_day to last_day, words excluded (refresh first)
+        window = Window(first_day, last_day)
+        low = min(max(first_day - self.origin, 0), len(self.pixels) - 1)
+        high = min(max(last_day - self.origin + 1, 0), len(self.pixels) - 1)
+        if high <= low:
+            return window
+        window.number_of_pixels = self.pixels[high] - self.pixels[low]
+        window.mood_counts = {mood: totals[high] - totals[low] for mood, totals in self.moods.items()}
+        window.score_sums = {number_of_scores: totals[high] - totals[low] for number_of_scores, totals in self.score_sums.items()
+                             if totals[high] != totals[low]}
+        return window
+
+
+
+def month_of(ordinal: int) -> tuple:
+    day = date.fromordinal(ordinal)
+    return day.year, day.month
+
+
+def month_days(year: int, month: int) -> tuple:
+    # (first day, last day) of a calendar month, as ordinals
+    return date(year, month, 1).toordinal(), date(year, month, calendar.monthrange(year, month)[1]).toordinal()
+
+
+def year_days(year: int) -> tuple:
+    # (first day, last day) of a calendar year, as ordinals
+    return date(year, 1, 1).toordinal(), date(year, 12, 31).toordinal()
+
+
+
+class StatsAccumulator:
+    """
+    Statistics of the pixels kept up to date pixel by pixel: streaks, and the moods, words and tags of all the pixels.
+    Each update costs the size of the updated pixel, not the size of the history. Any range of days (rolling days,
+    a calendar month or year, custom dates) is summed from prefix sums over the days, the words from the counts
+    kept per month. Only keeps plain values, so it can be saved with the pixels cache.
+    """
+
+    def __init__(self, excluded_words=()):
+        self.notes = NotesIndex(excluded_words)
+        self.ordinals = array('l')  # days, sorted
+        self.pixels = {}  # day ordinal -> (scores, tags) as counted
+        self.all = Window()
+        self.day_sums = DaySums()
+        self.month_words = {}  # (year, month) -> Counter of the token ids of the pixels of the month
+        self.runs = {}  # first day -> last day of each run of consecutive days
+        self.run_starts = {}  # last day -> first day
+        self.run_lengths = Counter()
+        self.tag_days = TagIndex()  # days using each tag
+        self.tags_seen = {}  # (category, name) -> (-day, position) of its most recent use
+        self._tags_seen_stale = False
+
+
+    @classmethod
+    def build(cls, pixels, excluded_words=()):
+        # the pixels must have distinct days
+        statistics = cls(excluded_words)
+        for pixel in pixels:
+            statistics.pixels[pixel.ordinal] = (bytes(pixel.scores), tuple(pixel.tags))
+            statistics.notes.add(pixel.ordinal, pixel.notes)
+        statistics.ordinals = array('l', sorted(statistics.pixels))
+        for ordinal in statistics.ordinals:
+            statistics._add_day(ordinal)
+        statistics.tag_days = TagIndex.build({ordinal: tags for ordinal, (_, tags) in statistics.pixels.items()})
+        statistics._see_all_tags()
+
+        window = statistics.all
+        window.number_of_pixels = len(statistics.ordinals)
+        for scores, _ in statistics.pixels.values():
+            window.score_sums[len(scores)] = window.score_sums.get(len(scores), 0) + sum(scores)
+        mood_counts = Counter(chain.from_iterable(scores for scores, _ in statistics.pixels.values()))
+        window.mood_counts = {mood: mood_counts[mood] for mood in MOODS}
+        # counted from the most recent pixel: ties are kept in that order by the tops
+        window.words = statistics.notes.counts(reversed(statistics.ordinals))
+        for month, ordinals in groupby(reversed(statistics.ordinals), key=month_of):
+            statistics.month_words[month] = statistics.notes.counts(ordinals)
+        if statistics.ordinals:
+            statistics.day_sums.refresh(statistics.pixels, statistics.ordinals[0], statistics.ordinals[-1])
+        return statistics
+
+
+    def same_settings(self, excluded_words) -> bool:
+        notes = NotesIndex(excluded_words)
+        return self.notes.excluded_words == notes.excluded_words and self.notes.accent_folding == notes.accent_folding
+
+
+    def update(self, pixel):
+        # To call each time a pixel is added, overwritten or modified
+        ordinal = pixel.ordinal
+        contribution = (bytes(pixel.scores), tuple(pixel.tags))
+        tokens = self.notes.tokenize(pixel.notes)
+        month_words = self.month_words.setdefault(month_of(ordinal), Counter())
+
+        previous = self.pixels.get(ordinal)
+        if previous is not None:
+            previous_tokens = self.notes.pixel_tokens[ordinal]
+            if previous == contribution and previous_tokens == tokens:
+                return
+            self.all.count(previous[0], previous_tokens, -1)
+            _count(month_words, previous_tokens, -1)
+            if any(self.tags_seen.get(tag, (None,))[0] == -ordinal for tag in previous[1]):
+                self._tags_seen_stale = True
+            self.tag_days.remove(ordinal, previous[1])
+        else:
+            self.ordinals.insert(bisect_left(self.ordinals, ordinal), ordinal)
+            self._add_day(ordinal)
+
+        self.pixels[ordinal] = contribution
+        self.notes.pixel_tokens[ordinal] = tokens
+        self.all.count(contribution[0], tokens, 1)
+        _count(month_words, tokens, 1)
+        self.tag_days.add(ordinal, contribution[1])
+        self.day_sums.invalidate(ordinal)
+        self._see_tags(ordinal, contribution[1])
+
+
+    def _add_day(self, ordinal: int):
+        # merges the day with the runs of consecutive days around it
+        first_day = self.run_starts.pop(ordinal - 1, None)
+        last_day = self.runs.pop(ordinal + 1, None)
+        if first_day is None:
+            first_day = ordinal
+        else:
+            del self.runs[first_day]
+            _count(self.run_lengths, (ordinal - first_day,), -1)
+        if last_day is None:
+            last_day = ordinal
+        else:
+            del self.run_starts[last_day]
+            _count(self.run_lengths, (last_day - ordinal,), -1)
+        self.runs[first_day] = last_day
+        self.run_starts[last_day] = first_day
+        self.run_lengths[last_day - first_day + 1] += 1
+
+
+    def _see_tags(self, ordinal: int, tags: tuple):
+        for position, tag in enumerate(tags):
+            seen = (-ordinal, position)
+            current_seen = self.tags_seen.get(tag)
+            if current_seen is None or seen < current_seen:
+                self.tags_seen[tag] = seen
+
+
+    def _see_all_tags(self):
+        self.tags_seen = {}
+        for ordinal in reversed(self.ordinals):
+            for position, tag in enumerate(self.pixels[ordinal][1]):
+                self.tags_seen.setdefault(tag, (-ordinal, position))
+        self._tags_seen_stale = False
+
+
+    def __len__(self):
+        return len(self.ordinals)
+
+
+    def streaks(self):
+        """
+        (longest streak, current streak), the current streak being the counter left when
+        walking the days from the most recent to the first one.
+        """
+        number_of_days = len(self.ordinals)
+        if number_of_days < 2:
+            return number_of_days, number_of_days
+        recent_run = self.ordinals[-1] - self.run_starts[self.ordinals[-1]] + 1
+        if len(self.runs) == 1:
+            return recent_run, recent_run
+        oldest_run = self.runs[self.ordinals[0]] - self.ordinals[0] + 1
+        # the counter restarts at 0 after a missed day: the runs before the most recent one count one day less
+        other_runs = max(length for length, count in self.run_lengths.items() if count > (length == recent_run))
+        return max(1, recent_run, other_runs - 1), oldest_run - 1
+
+
+    def total_days(self):
+        # days between the first and the last pixel, both included
+        return self.ordinals[-1] - self.ordinals[0] + 1
+
+
+    def days_missed(self):
+        return self.total_days() - len(self.ordinals)
+
+
+    #  Windows
+
+    def window(self, first_day: int, last_day: int) -> Window:
+        # Aggregates of the pixels of the days first_day to last_day (ordinals, both included)
+        if len(self.ordinals) == 0:
+            return Window(first_day, last_day)
+        self.day_sums.refresh(self.pixels, self.ordinals[0], self.ordinals[-1])
+        window = self.day_sums.window(first_day, last_day)
+        if window.number_of_pixels > 0:
+            window.words = self._words(first_day, last_day)
+        return window
+
+
+    def _words(self, first_day: int, last_day: int) -> Counter:
+        # the months inside the range are added whole, the days of the other months one by one, the most recent first
+        words = Counter()
+        first_day = max(first_day, self.ordinals[0])
+        day = min(last_day, self.ordinals[-1])
+        while day >= first_day:
+            year, month = month_of(day)
+            month_first_day, month_last_day = month_days(year, month)
+            if day == month_last_day and month_first_day >= first_day:
+                words.update(self.month_words.get((year, month), ()))
+            else:
+                low = bisect_left(self.ordinals, max(month_first_day, first_day))
+                high = bisect_left(self.ordinals, day + 1)
+                words.update(self.notes.counts(self.ordinals[low:high][::-1]))
+            day = month_first_day - 1
+        return words
+
+
+    def last_days(self, number_of_days: int) -> Window:
+        # the number_of_days days up to the last pixel
+        last_day = self.ordinals[-1] if len(self.ordinals) else date.today().toordinal()
+        return self.window(last_day - number_of_days + 1, last_day)
+
+
+    def month(self, year: int, month: int) -> Window:
+        return self.window(*month_days(year, month))
+
+
+    def year(self, year: int) -> Window:
+        return self.window(*year_days(year))
+
+
+    def years(self) -> list:
+        # calendar years with pixels, the oldest first
+        return sorted({year for year, _ in self.month_words if self.year_has_pixels(year)})
+
+
+    def year_has_pixels(self, year: int) -> bool:
+        first_day, last_day = year_days(year)
+        return bisect_left(self.ordinals, first_day) != bisect_left(self.ordinals, last_day + 1)
+
+
+    def top_words(self, window: Window, number_of_words: int) -> list:
+        # ties by most recent use, like the tags
+        if window.first_day is None:
+            days = reversed(self.ordinals)
+        else:
+            low = bisect_left(self.ordinals, window.first_day)
+            high = bisect_left(self.ordinals, window.last_day + 1)
+            days = reversed(self.ordinals[low:high])
+        return self.notes.top(window.words, number_of_words, days)
+
+
+    def tag_names(self) -> dict:
+        """
+        (category, name) -> name displayed in the statistics, "name (category)". Tags of different categories
+        whose name is the first word of an already named tag (most recent first) are counted with it.
+        """
+        if self._tags_seen_stale:
+            self._see_all_tags()
+        tag_names = {}
+        aliases = {}  # lower case first word -> the first name starting with it
+        for tag in sorted(self.tags_seen, key=self.tags_seen.__getitem__):
+            category, name = tag
+            name = aliases.get(name.lower(), name)
+            if not name.endswith(")"):
+                name = f"{name} ({category})"
+            aliases.setdefault(name.split(" ")[0].lower(), name)
+            tag_names[tag] = name
+        return tag_names
+
+
+    def tag_counts(self, window: Window, tag_names: dict) -> dict:
+        # number of pixels using each displayed tag name, in first use order in the window (most recent first)
+        tag_days = self.tag_days
+        counts_by_id = tag_days.counts(window.first_day, window.last_day)
+        tags = tag_names
+        if window.first_day is not None:
+            # the tags of the window by most recent use, then by position in that pixel
+            last_uses_by_id = tag_days.last_uses(window.first_day, window.last_day)
+            last_uses = {}
+            for tag in tag_names:
+                last_use = last_uses_by_id.get(tag_days.registry.ids.get(tag))
+                if last_use is not None:
+                    last_uses[tag] = last_use
+            tags = sorted(last_uses, key=lambda tag: (-last_uses[tag], self.pixels[last_uses[tag]][1].index(tag)))
+        counts = {}
+        for tag in tags:
+            name = tag_names[tag]
+            count = counts_by_id.get(tag_days.registry.ids.get(tag))
+            if count:
+                counts[name] = counts.get(name, 0) + count
+        return counts
+
+
+    def tag_pairs(self, window: Window, tag_names: dict, number_of_tags: int) -> list:
+        # (name, name, number of pixels using both) for the number_of_tags most used tags, the most frequent pairs first
+        counts = self.tag_counts(window, tag_names)
+        top_names = sorted(counts, key=counts.__getitem__, reverse=True)[:number_of_tags]
+        groups = {name: [] for name in top_names}
+        for tag, name in tag_names.items():
+            if name in groups:
+                groups[name].append(self.tag_days.registry.id_of(tag))
+        pairs = self.tag_days.co_occurrences(groups, window.first_day, window.last_day)
+        return [(name, other_name, count) for (name, other_name), count in
+                sorted(pairs.items(), key=lambda item: item[1], reverse=True)]
+
+
+    def summary(self) -> dict:
+        # Plain values of all the pixels, to compare or merge the statistics of several backups
+        if len(self) == 0:
+            return {"pixels": 0, "first_day": None, "last_day": None, "longest_streak": 0, "current_streak": 0,
+                    "days_missed": 0, "mood_counts": dict.fromkeys(MOODS, 0), "moods_sum": 0.0, "words": {}, "tags": {}}
+        longest_streak, current_streak = self.streaks()
+        moods_sum = sum(Fraction(scores_sum, number_of_scores) for number_of_scores, scores_sum in self.all.score_sums.items())
+        return {
+            "pixels": len(self),
+            "first_day": self.ordinals[0],
+            "last_day": self.ordinals[-1],
+            "longest_streak": longest_streak,
+            "current_streak": current_streak,
+            "days_missed": self.days_missed(),
+            "mood_counts": dict(self.all.mood_counts),
+            "moods_sum": float(moods_sum),
+            "words": {self.notes.tokens[token_id]: count for token_id, count in self.all.words.items()},
+            "tags": self.tag_counts(self.all, self.tag_names()),
+        }
+
+
+
+def merge_summaries(summaries) -> dict:
+    # Statistics of several backups together (see StatsAccumulator.summary)
+    merged = {"backups": 0, "pixels": 0, "longest_streak": 0, "current_streaks": 0, "days_missed": 0,
+              "mood_counts": Counter(), "moods_sum": 0.0, "words": Counter(), "tags": Counter()}
+    for summary in summaries:
+        merged["backups"] += 1
+        merged["pixels"] += summary["pixels"]
+        merged["longest_streak"] = max(merged["longest_streak"], summary["longest_streak"])
+        merged["current_streaks"] += summary["current_streak"]
+        merged["days_missed"] += summary["days_missed"]
+        merged["mood_counts"].update(summary["mood_counts"])
+        merged["moods_sum"] += summary["moods_sum"]
+        merged["words"].update(summary["words"])
+        merged["tags"].update(summary["tags"])
+    return merged
@@ -0,0 +1,108 @@
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+
+
+def date_to_ordinal(date_string: str) -> int:
+    # "2023-1-5" and "2023-01-05" are the same day
+    year, month, day = str(date_string).strip().split("-")
+    return date(int(year), int(month), int(day)).toordinal()
+
+
+
+class PixelStore:
+    """
+    Collection of pixels indexed by day.
+    Iterates in insertion order (the order of the backup file), like the plain list it replaces,
+    while keeping a day -> pixel hash index and a sorted array of days for range queries.
+    """
+
+    def __init__(self, pixels=()):
+        self._index = {}  # day ordinal -> Pixel, insertion ordered
+        for pixel in pixels:
+            if pixel.ordinal not in self._index:  # keep the first pixel of a day (duplicates in backups)
+                self._index[pixel.ordinal] = pixel
+        self._ordinals = sorted(self._index)
+        self._listeners = []
+        self.indexes = {}  # indexes built on the store (by name), kept up to date through subscribe
+
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index.values())
+
+    def __contains__(self, date_string):
+        try:
+            return date_to_ordinal(date_string) in self._index
+        except ValueError:
+            return False
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return list(self._index.values())[item]
+        if item < 0:
+            item += len(self._index)
+        if not 0 <= item < len(self._index):
+            raise IndexError("PixelStore index out of range")
+        for i, pixel in enumerate(self._index.values()):
+            if i == item:
+                return pixel
+
+    def copy(self):
+        return list(self._index.values())
+
+    def items(self):
+        # (day ordinal, pixel) pairs, in insertion order
+        return self._index.items()
+
+
+    def get(self, date_string, default=None):
+        return self._index.get(date_to_ordinal(date_string), default)
+
+
+    def add(self, pixel):
+        # Insert a pixel, overwriting in place the pixel of the same day. Returns the overwritten pixel.
+        ordinal = pixel.ordinal
+        previous = self._index.get(ordinal)
+        self._index[ordinal] = pixel
+        if previous is None:
+            position = bisect_left(self._ordinals, ordinal)
+            self._ordinals.insert(position, ordinal)
+        self.touch(pixel)
+        return previous
+
+    append = add
+
+
+    def subscribe(self, listener):
+        # listener(pixel) is called each time a pixel is added, overwritten or modified
+        self._listeners.append(listener)
+
+
+    def touch(self, pixel):
+        # To call after modifying a pixel in place (tags added...)
+        for listener in self._listeners:
+            listener(pixel)
+
+
+    def range(self, start=None, end=None):
+        # Pixels between two dates (both included), sorted by date
+        low = 0 if start is None else bisect_left(self._ordinals, date_to_ordinal(start))
+        high = len(self._ordinals) if end is None else bisect_right(self._ordinals, date_to_ordinal(end))
+        return [self._index[ordinal] for ordinal in self._ordinals[low:high]]
+
+
+    def last(self, number):
+        # The number most recent pixels, sorted by date
+        return [self._index[ordinal] for ordinal in self._ordinals[max(0, len(self._ordinals) - number):]]
+
+
+    def sorted(self, reverse=False):
+        ordinals = reversed(self._ordinals) if reverse else self._ordinals
+        return [self._index[ordinal] for ordinal in ordinals]
+
+
+    def ordinals(self, reverse=False):
+        return self._ordinals[::-1] if reverse else self._ordinals.copy()
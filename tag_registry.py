@@ -0,0 +1,175 @@
+import sys
+
+
+
+class TagRegistry:
+    """
+    Vocabulary of the (category, name) tag pairs. Each pair is stored once and gets a stable integer id,
+    pixels only keep references to the shared pairs.
+    """
+
+    def __init__(self):
+        self.ids = {}  # (category, name) -> id
+        self.pairs = []  # id -> (category, name)
+
+
+    def __len__(self):
+        return len(self.pairs)
+
+
+    def intern(self, category: str, name: str) -> tuple:
+        pair = (category, name)
+        tag_id = self.ids.get(pair)
+        if tag_id is None:
+            pair = (sys.intern(category), sys.intern(name))
+            self.ids[pair] = len(self.pairs)
+            self.pairs.append(pair)
+            return pair
+        return self.pairs[tag_id]
+
+
+    def id_of(self, pair: tuple) -> int:
+        return self.ids[pair]
+
+
+    def pair_of(self, tag_id: int) -> tuple:
+        return self.pairs[tag_id]
+
+
+
+# shared by all the pixels
+TAGS = TagRegistry()
+
+
+
+def _bitmap(offsets) -> int:
+    # int with the given bits set, built in one pass
+    offsets = list(offsets)
+    if not offsets:
+        return 0
+    bits = bytearray(max(offsets) // 8 + 1)
+    for offset in offsets:
+        bits[offset >> 3] |= 1 << (offset & 7)
+    return int.from_bytes(bits, "little")
+
+
+
+class TagIndex:
+    """
+    Days using each tag: one bitmap per tag id of the registry, bit i for the day origin + i.
+    Counts over a range of days and co-occurrences are popcounts of the bitmaps, intersected.
+    Pickled with the (category, name) pairs, the ids being those of the running registry.
+    """
+
+    def __init__(self, registry=TAGS):
+        self.registry = registry
+        self.origin = None  # day of the bit 0
+        self.bitmaps = {}  # tag id -> int
+
+
+    @classmethod
+    def build(cls, day_tags: dict, registry=TAGS):
+        # day_tags: day ordinal -> (category, name) tags of the pixel
+        index = cls(registry)
+        if not day_tags:
+            return index
+        index.origin = min(day_tags)
+        offsets = {}
+        for ordinal, tags in day_tags.items():
+            for tag in tags:
+                offsets.setdefault(registry.id_of(registry.intern(*tag)), []).append(ordinal - index.origin)
+        index.bitmaps = {tag_id: _bitmap(tag_offsets) for tag_id, tag_offsets in offsets.items()}
+        return index
+
+
+    def __getstate__(self):
+        return {"origin": self.origin, "bitmaps": {self.registry.pair_of(tag_id): bitmap for tag_id, bitmap in self.bitmaps.items()}}
+
+    def __setstate__(self, state):
+        self.registry = TAGS
+        self.origin = state["origin"]
+        self.bitmaps = {TAGS.id_of(TAGS.intern(*pair)): bitmap for pair, bitmap in state["bitmaps"].items()}
+
+
+    def _offset(self, ordinal: int) -> int:
+        if self.origin is None:
+            self.origin = ordinal
+        elif ordinal < self.origin:
+            shift = self.origin - ordinal
+            self.bitmaps = {tag_id: bitmap << shift for tag_id, bitmap in self.bitmaps.items()}
+            self.origin = ordinal
+        return ordinal - self.origin
+
+
+    def add(self, ordinal: int, tags):
+        bit = 1 << self._offset(ordinal)
+        for tag in tags:
+            tag_id = self.registry.id_of(self.registry.intern(*tag))
+            self.bitmaps[tag_id] = self.bitmaps.get(tag_id, 0) | bit
+
+
+    def remove(self, ordinal: int, tags):
+        if self.origin is None or ordinal < self.origin:
+            return
+        bit = 1 << (ordinal - self.origin)
+        for tag in tags:
+            tag_id = self.registry.ids.get(tuple(tag))
+            if tag_id in self.bitmaps:
+                self.bitmaps[tag_id] &= ~bit
+                if not self.bitmaps[tag_id]:
+                    del self.bitmaps[tag_id]
+
+
+    def _mask(self, first_day=None, last_day=None):
+        # bits of the days first_day to last_day (both included), None for all of them
+        if first_day is None or self.origin is None:
+            return None
+        low = max(0, first_day - self.origin)
+        high = last_day - self.origin + 1
+        return ((1 << (high - low)) - 1) << low if high > low else 0
+
+
+    def counts(self, first_day=None, last_day=None) -> dict:
+        # tag id -> number of days using it, among the days first_day to last_day (all of them by default)
+        mask = self._mask(first_day, last_day)
+        if mask is None:
+            return {tag_id: bitmap.bit_count() for tag_id, bitmap in self.bitmaps.items()}
+        counts = {}
+        for tag_id, bitmap in self.bitmaps.items():
+            count = (bitmap & mask).bit_count()
+            if count:
+                counts[tag_id] = count
+        return counts
+
+
+    def last_uses(self, first_day=None, last_day=None) -> dict:
+        # tag id -> most recent day using it, among the days first_day to last_day (all of them by default)
+        mask = self._mask(first_day, last_day)
+        last_uses = {}
+        for tag_id, bitmap in self.bitmaps.items():
+            if mask is not None:
+                bitmap &= mask
+            if bitmap:
+                last_uses[tag_id] = self.origin + bitmap.bit_length() - 1
+        return last_uses
+
+
+    def co_occurrences(self, groups: dict, first_day=None, last_day=None) -> dict:
+        """
+        (key, key) -> number of days using a tag of both groups, for each pair of groups used together.
+        groups: key -> tag ids counted as one tag (the ids of the tags displayed with the same name).
+        """
+        mask = self._mask(first_day, last_day)
+        bitmaps = []
+        for key, tag_ids in groups.items():
+            bitmap = 0
+            for tag_id in tag_ids:
+                bitmap |= self.bitmaps.get(tag_id, 0)
+            bitmaps.append((key, bitmap if mask is None else bitmap & mask))
+        pairs = {}
+        for i, (key, bitmap) in enumerate(bitmaps):
+            for other_key, other_bitmap in bitmaps[i + 1:]:
+                count = (bitmap & other_bitmap).bit_count()
+                if count:
+                    pairs[(key, other_key)] = count
+        return pairs
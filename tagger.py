@@ -0,0 +1,103 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+import re
+
+import profiling
+
+
+
+# below this number of pixels, starting worker processes costs more than it saves
+PARALLEL_MIN_PIXELS = 20000
+
+_WORD = re.compile(r"\w+")
+
+
+
+class Tagger:
+    """
+    Auto-tagging rules compiled once. A rule (tag, formated tag name) adds its tag to a pixel whose formated note
+    contains the name as a whole word, then removes the name from the note so the next rules can't match it again.
+    Rules are applied in order, only those whose first word is in the note are tried.
+    """
+
+    def __init__(self, rules):
+        # rules: list of (tag, formated tag name)
+        self.tags = [tag for tag, _ in rules]
+        self.patterns = [re.compile(fr'\b{re.escape(name)}\b') for _, name in rules]
+        self.rules_by_word = {}  # first word of the name -> rule indexes
+        self.unanchored = set()  # names starting or ending with a non-word character: always tried
+        for i, (_, name) in enumerate(rules):
+            first_word = _WORD.match(name)
+            if first_word and _WORD.fullmatch(name[-1]):
+                self.rules_by_word.setdefault(first_word.group(), []).append(i)
+            else:
+                self.unanchored.add(i)
+
+
+    def tag_note(self, formated_note: str, tags: set, matches: list) -> list:
+        # Tags to add to a pixel (tags: the tags it already has), counts the matches of each rule in matches
+        candidates = set(self.unanchored)
+        for word in set(_WORD.findall(formated_note)):
+            candidates.update(self.rules_by_word.get(word, ()))
+        if not candidates:
+            return []
+
+        added_tags = []
+        tags = set(tags)
+        candidates = sorted(candidates)
+        position = 0
+        while position < len(candidates):
+            i = candidates[position]
+            position += 1
+            tag = self.tags[i]
+            if tag in tags:
+                continue
+            pattern = self.patterns[i]
+            if pattern.search(formated_note):
+                added_tags.append(tag)
+                tags.add(tag)
+                matches[i] += 1
+                formated_note = pattern.sub('', formated_note)
+                if i in self.unanchored:
+                    # removing a name bounded by non-word characters can join two words: try every next rule
+                    candidates = candidates[:position] + list(range(i+1, len(self.tags)))
+        return added_tags
+
+
+    def tag_notes(self, formated_notes, pixels_tags):
+        # Tags to add to each pixel, and the number of matches of each rule
+        matches = [0] * len(self.tags)
+        added_tags = [self.tag_note(note, tags, matches) for note, tags in zip(formated_notes, pixels_tags)]
+        return added_tags, matches
+
+
+
+def _tag_shard(rules, formated_notes, pixels_tags):
+    return Tagger(rules).tag_notes(formated_notes, pixels_tags)
+
+
+def tag_pixels(rules, formated_notes: list, pixels_tags: list, workers=None):
+    """
+    Tags to add to each pixel and the number of matches of each rule.
+    Big archives are split in shards tagged by a pool of processes (workers: os.cpu_count() by default).
+    """
+    workers = workers or os.cpu_count() or 1
+    profiling.count("pixels scanned", len(formated_notes))
+    if workers == 1 or len(formated_notes) < PARALLEL_MIN_PIXELS:
+        profiling.count("regexes compiled", len(rules))
+        return Tagger(rules).tag_notes(formated_notes, pixels_tags)
+
+    shard_size = -(-len(formated_notes) // workers)
+    profiling.count("regexes compiled", len(rules) * -(-len(formated_notes) // shard_size))  # one Tagger per shard
+    added_tags = []
+    matches = [0] * len(rules)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        shards = [
+            executor.submit(_tag_shard, rules, formated_notes[start:start+shard_size], pixels_tags[start:start+shard_size])
+            for start in range(0, len(formated_notes), shard_size)
+        ]
+        for shard in shards:
+            shard_tags, shard_matches = shard.result()
+            added_tags.extend(shard_tags)
+            matches = [total + count for total, count in zip(matches, shard_matches)]
+    return added_tags, matches
@@ -0,0 +1,23 @@
+from types import SimpleNamespace
+
+from store import PixelStore
+
+
+def make_store(number_of_pixels: int) -> PixelStore:
+    # the store only needs the day ordinal of the pixels
+    return PixelStore(SimpleNamespace(ordinal=738000 + day) for day in range(number_of_pixels))
+
+
+def test_last_returns_the_most_recent_pixels_sorted_by_date():
+    store = make_store(20)
+    assert [pixel.ordinal for pixel in store.last(3)] == [738017, 738018, 738019]
+
+
+def test_last_more_pixels_than_the_store_returns_all_of_them():
+    store = make_store(20)
+    for number in (20, 25, 35, 100):
+        assert [pixel.ordinal for pixel in store.last(number)] == [738000 + day for day in range(20)]
+
+
+def test_last_zero_pixels():
+    assert make_store(20).last(0) == []
@@ -0,0 +1,224 @@
+from array import array
+from datetime import date
+from itertools import accumulate
+import calendar
+import math
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the same results are computed with plain arrays
+    np = None
+
+
+
+NAN = float("nan")
+# first day of the numpy calendar, to find the month of the days
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+
+def _decay_filter(values, decay: float):
+    """
+    y[t] = decay * y[t-1] + (1 - decay) * values[t], y[-1] = 0. With numpy, computed by blocks of days
+    with the closed form y[t0+k] = decay^(k+1) y[t0-1] + (1 - decay) decay^k sum(values[t0+j] decay^-j, j <= k),
+    the blocks being short enough for decay^-j to stay finite.
+    """
+    if np is None:
+        filtered = array('d')
+        current = 0.0
+        for value in values:
+            current = decay * current + (1 - decay) * value
+            filtered.append(current)
+        return filtered
+
+    filtered = np.empty(len(values))
+    block_size = max(1, min(256, int(250 / -math.log10(decay)) if decay > 0 else 1))
+    powers = decay ** np.arange(block_size)
+    current = 0.0
+    for start in range(0, len(values), block_size):
+        block = values[start:start + block_size]
+        block_powers = powers[:len(block)]
+        filtered[start:start + len(block)] = (
+            decay * block_powers * current + (1 - decay) * block_powers * np.cumsum(block / block_powers))
+        current = filtered[start + len(block) - 1]
+    return filtered
+
+
+
+class MoodSeries:
+    """
+    Mood of each day (mean of the scores of its pixel) from the first pixel to the last one, the days without a pixel
+    being gaps (NaN). Every statistic is a pass over the days, on numpy arrays when numpy is installed.
+    """
+
+    def __init__(self, ordinals, moods):
+        # ordinals: sorted days with a pixel, moods: the mood of each of them
+        self.origin = ordinals[0] if len(ordinals) else 0
+        number_of_days = ordinals[-1] - self.origin + 1 if len(ordinals) else 0
+        if np is not None:
+            self.values = np.full(number_of_days, np.nan)
+            self.values[np.asarray(ordinals, dtype=np.int64) - self.origin] = moods
+            self.present = ~np.isnan(self.values)
+        else:
+            self.values = array('d', [NAN]) * number_of_days
+            for ordinal, mood in zip(ordinals, moods):
+                self.values[ordinal - self.origin] = mood
+            self.present = [value == value for value in self.values]
+
+
+    @classmethod
+    def from_pixels(cls, pixels):
+        # pixels sorted by date
+        ordinals = array('l')
+        moods = array('d')
+        for pixel in pixels:
+            ordinals.append(pixel.ordinal)
+            moods.append(sum(pixel.scores) / len(pixel.scores))
+        return cls(ordinals, moods)
+
+
+    def __len__(self):
+        return len(self.values)
+
+
+    def _index(self, ordinal: int) -> int:
+        return ordinal - self.origin
+
+
+    def _window_sums(self, days: int, current=True):
+        """
+        (number of pixels, sum, sum of squares) of the moods of the days days before each day,
+        the day included (current) or not.
+        """
+        if np is not None:
+            filled = np.where(self.present, self.values, 0.0)
+            prefixes = [np.concatenate(([0.0], np.cumsum(column))) for column in (self.present.astype(float), filled, filled * filled)]
+            high = np.arange(len(self.values)) + (1 if current else 0)
+            low = np.maximum(high - days, 0)
+            return [prefix[high] - prefix[low] for prefix in prefixes]
+        filled = [value if present else 0.0 for value, present in zip(self.values, self.present)]
+        prefixes = [list(accumulate(column, initial=0.0)) for column in (map(float, self.present), filled, [value * value for value in filled])]
+        shift = 1 if current else 0
+        return [[prefix[i + shift] - prefix[max(i + shift - days, 0)] for i in range(len(self.values))] for prefix in prefixes]
+
+
+    def moving_average(self, days: int):
+        # average mood of the days days up to each day (NaN without any pixel)
+        counts, sums, _ = self._window_sums(days)
+        if np is not None:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        return array('d', [total / count if count else NAN for count, total in zip(counts, sums)])
+
+
+    def trend(self, half_life: float):
+        # exponentially weighted mood, the weight of a day halved every half_life days (gaps don't count)
+        decay = 0.5 ** (1 / half_life)
+        if np is not None:
+            sums = _decay_filter(np.where(self.present, self.values, 0.0), decay)
+            weights = _decay_filter(self.present.astype(float), decay)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(weights > 0, sums / np.where(weights > 0, weights, 1), np.nan)
+        sums = _decay_filter([value if present else 0.0 for value, present in zip(self.values, self.present)], decay)
+        weights = _decay_filter([float(present) for present in self.present], decay)
+        return array('d', [total / weight if weight > 0 else NAN for total, weight in zip(sums, weights)])
+
+
+    def _group_means(self, groups, number_of_groups: int) -> list:
+        # average mood of the days of each group (None for the groups without pixels)
+        if np is not None:
+            counts = np.bincount(groups[self.present], minlength=number_of_groups)
+            sums = np.bincount(groups[self.present], weights=self.values[self.present], minlength=number_of_groups)
+            return [float(sums[i] / counts[i]) if counts[i] else None for i in range(number_of_groups)]
+        counts = [0] * number_of_groups
+        sums = [0.0] * number_of_groups
+        for group, value, present in zip(groups, self.values, self.present):
+            if present:
+                counts[group] += 1
+                sums[group] += value
+        return [sums[i] / counts[i] if counts[i] else None for i in range(number_of_groups)]
+
+
+    def weekday_means(self) -> list:
+        # average mood of each day of the week, Monday first
+        first_weekday = date.fromordinal(self.origin).weekday() if len(self) else 0
+        if np is not None:
+            return self._group_means((np.arange(len(self.values)) + first_weekday) % 7, 7)
+        return self._group_means([(i + first_weekday) % 7 for i in range(len(self.values))], 7)
+
+
+    def month_means(self) -> list:
+        # average mood of each month of the year, January first
+        if np is not None:
+            days = np.arange(len(self.values)) + (self.origin - _EPOCH)
+            months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) % 12
+            return self._group_means(months, 12)
+        months = []
+        if len(self):
+            last_day = self.origin + len(self.values) - 1
+            for year, month in _calendar_months(self.origin, last_day):
+                months.extend([month - 1] * _month_length(year, month, self.origin, last_day))
+        return self._group_means(months, 12)
+
+
+    def anomalies(self, days: int, threshold=2.0, min_pixels=7) -> list:
+        """
+        (day, mood, z-score) of the days whose mood is at least threshold standard deviations away from the mood of
+        the days days before them (with at least min_pixels pixels), the most unusual first.
+        """
+        counts, sums, squares = self._window_sums(days, current=False)
+        if np is not None:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = sums / np.maximum(counts, 1)
+                deviations = np.sqrt(np.maximum(squares / np.maximum(counts, 1) - means * means, 0.0))
+                scores = (self.values - means) / deviations
+            valid = self.present & (counts >= min_pixels) & (deviations > 1e-9) & (np.abs(scores) >= threshold)
+            indexes = np.flatnonzero(valid)
+            indexes = indexes[np.argsort(-np.abs(scores[indexes]), kind="stable")]
+            return [(int(i) + self.origin, float(self.values[i]), float(scores[i])) for i in indexes]
+        found = []
+        for i, (value, present, count, total, square) in enumerate(zip(self.values, self.present, counts, sums, squares)):
+            if not present or count < min_pixels:
+                continue
+            mean = total / count
+            deviation = math.sqrt(max(square / count - mean * mean, 0.0))
+            if deviation > 1e-9 and abs(value - mean) / deviation >= threshold:
+                found.append((i + self.origin, value, (value - mean) / deviation))
+        found.sort(key=lambda anomaly: -abs(anomaly[2]))
+        return found
+
+
+    def relative_mood(self, ordinals, days: int):
+        # average difference between the mood of the given days and the moving average of the days days before them
+        counts, sums, _ = self._window_sums(days, current=False)
+        differences = []
+        for ordinal in ordinals:
+            i = self._index(ordinal)
+            if 0 <= i < len(self.values) and self.present[i] and counts[i] > 0:
+                differences.append(float(self.values[i]) - float(sums[i]) / float(counts[i]))
+        return sum(differences) / len(differences) if differences else None
+
+
+    def value_at(self, series, ordinal: int):
+        # value of a series computed by the methods above at a day (None without value)
+        i = self._index(ordinal)
+        if not 0 <= i < len(series) or series[i] != series[i]:
+            return None
+        return float(series[i])
+
+
+
+def _calendar_months(first_day: int, last_day: int):
+    # (year, month) of the months from the day first_day to the day last_day
+    year, month = date.fromordinal(first_day).year, date.fromordinal(first_day).month
+    last_year, last_month = date.fromordinal(last_day).year, date.fromordinal(last_day).month
+    while (year, month) <= (last_year, last_month):
+        yield year, month
+        year, month = (year, month + 1) if month < 12 else (year + 1, 1)
+
+
+def _month_length(year: int, month: int, first_day: int, last_day: int) -> int:
+    # number of days of the month between the days first_day and last_day
+    month_first_day = date(year, month, 1).toordinal()
+    month_last_day = month_first_day + calendar.monthrange(year, month)[1] - 1
+    return min(month_last_day, last_day) - max(month_first_day, first_day) + 1